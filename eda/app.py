@@ -1,16 +1,21 @@
-import duckdb
+import sys
+from pathlib import Path
+
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from etl.utils.duckdb_conn import reading
+
 st.set_page_config(page_title='EmpresaX – Custos & QA', layout='wide')
 WAREHOUSE = 'data/warehouse/whirlpool.duckdb'
 
 @st.cache_data(ttl=120)
 def q(sql: str, params: dict | None = None) -> pd.DataFrame:
-    con = duckdb.connect(WAREHOUSE, read_only=True)
-    df = con.execute(sql, params or {}).fetch_df()
-    con.close()
+    # conexão somente-leitura aberta só durante a consulta: o ETL de outro processo pode gravar
+    with reading(WAREHOUSE) as con:
+        df = con.execute(sql, params or {}).fetch_df()
     # Só cria a coluna de data quando houver date_key
     if 'date_key' in df.columns and 'date' not in df.columns:
         df['date'] = pd.to_datetime(df['date_key'].astype(str), format='%Y%m%d', errors='coerce')
@@ -1,13 +1,29 @@
-import os, pathlib, duckdb, pandas as pd
+import os, pathlib, sys, pandas as pd
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[3]))
+from etl.load.snapshots import list_snapshots, snapshot_as_of, snapshot_files
+from etl.quality.profile import load_profile
+from etl.utils.duckdb_conn import get_connection, close_all
 WAREHOUSE = os.environ.get('WAREHOUSE_PATH', 'data/warehouse/whirlpool.duckdb')
 SILVER    = os.environ.get('SILVER_BASE',   'data/silver')
 GOLD_DIR  = os.environ.get('GOLD_DIR',      'data/gold')
 REPORTS   = os.environ.get('REPORTS_DIR',   'reports/qa')
-
-def bootstrap(con, silver_base):
-    p_costs  = f"{silver_base}/costs/costs.parquet"
-    p_manu   = f"{silver_base}/manufacturing/manufacturing.parquet"
-    p_energy = f"{silver_base}/energy/energy.parquet"
+AS_OF     = os.environ.get('SILVER_AS_OF')     # time travel: valida a Silver como estava nesse instante (ISO)
+
+def silver_source(silver_base, domain, as_of=None):
+    # lê pelo snapshot (atual ou o de `as_of`) quando a camada tem snapshots; senão, o glob da pasta
+    base = f"{silver_base}/{domain}"
+    if not list_snapshots(base):
+        return f"'{base}/**/*.parquet'"
+    snapshot_id = snapshot_as_of(base, as_of) if as_of else None
+    if as_of and snapshot_id is None:
+        raise SystemExit(f"[VALIDATION] nenhum snapshot de {base} até {as_of}")
+    return "[" + ", ".join(f"'{p}'" for p in snapshot_files(base, snapshot_id)) + "]"
+
+def bootstrap(con, silver_base, as_of=None):
+    # uma parte por arquivo de origem, em partições Hive (site_code=.../year=.../month=...)
+    p_costs  = silver_source(silver_base, 'costs', as_of)
+    p_manu   = silver_source(silver_base, 'manufacturing', as_of)
+    p_energy = silver_source(silver_base, 'energy', as_of)
 
     con.execute(
         """
@@ -15,7 +31,7 @@ def bootstrap(con, silver_base):
         WITH base AS (
           SELECT CAST(ref_month AS VARCHAR) AS ref_txt, site_code, cost_center, account_code, account_name,
                  amount_br, amount_fx, fx_rate
-          FROM read_parquet('""" + p_costs + """')
+          FROM read_parquet(""" + p_costs + """, hive_partitioning=true)
           WHERE ref_month IS NOT NULL
         )
         SELECT
@@ -32,7 +48,7 @@ def bootstrap(con, silver_base):
         WITH base AS (
           SELECT CAST(date AS VARCHAR) AS date_txt, site_code, line_code, product_code,
                  units_ok, units_rework, scrap_units, takt_time_s, oee
-          FROM read_parquet('""" + p_manu + """')
+          FROM read_parquet(""" + p_manu + """, hive_partitioning=true)
         ), parts AS (
           SELECT CAST(substr(date_txt,1,4) AS INTEGER) AS y,
                  CAST(substr(date_txt,6,2) AS INTEGER) AS m,
@@ -54,7 +70,7 @@ def bootstrap(con, silver_base):
         WITH base AS (
           SELECT CAST(timestamp AS VARCHAR) AS ts_txt, site_code, line_code, equip_code,
                  kwh, kw_demand, kvarh
-          FROM read_parquet('""" + p_energy + """')
+          FROM read_parquet(""" + p_energy + """, hive_partitioning=true)
         ), dparts AS (
           SELECT substr(ts_txt,1,10) AS day_txt, site_code, line_code, equip_code, kwh, kw_demand, kvarh FROM base
         ), parts AS (
@@ -115,6 +131,36 @@ def bootstrap(con, silver_base):
         """
     )
 
+# coluna de data de cada domínio na Silver (regras de frescor)
+DATE_COLS = {'costs': 'ref_month', 'manufacturing': 'date', 'energy': 'timestamp'}
+
+def load_profiles(con, silver_base, as_of=None):
+    # qa.profile: estatísticas por coluna gravadas pelo ETL (silver/<domínio>/_profile.json);
+    # sem perfil (ou em time travel) cai numa leitura agregada da Silver
+    con.execute("""
+    CREATE OR REPLACE TABLE qa.profile (
+      domain TEXT, column_name TEXT, rows BIGINT, nulls BIGINT,
+      min_value TEXT, max_value TEXT, distinct_est BIGINT, negatives BIGINT, source TEXT
+    );
+    """)
+    for domain, date_col in DATE_COLS.items():
+        profile = None if as_of else load_profile(f"{silver_base}/{domain}")
+        if profile is not None:
+            con.executemany(
+                "INSERT INTO qa.profile VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'profile')",
+                [(domain, c, profile['rows'], st['nulls'],
+                  None if st['min'] is None else str(st['min']), None if st['max'] is None else str(st['max']),
+                  st.get('distinct'), st['negatives']) for c, st in profile['columns'].items()],
+            )
+            continue
+        con.execute(f"""
+        INSERT INTO qa.profile
+        SELECT '{domain}', '{date_col}', count(*), count(*) - count("{date_col}"),
+               CAST(min("{date_col}") AS TEXT), CAST(max("{date_col}") AS TEXT),
+               approx_count_distinct("{date_col}"), NULL, 'scan'
+        FROM read_parquet({silver_source(silver_base, domain, as_of)}, hive_partitioning=true)
+        """)
+
 def ensure_qa(con):
     con.execute("""
     CREATE SCHEMA IF NOT EXISTS qa;
@@ -167,9 +213,10 @@ def main():
     os.makedirs(GOLD_DIR, exist_ok=True)
     os.makedirs(REPORTS, exist_ok=True)
 
-    con = duckdb.connect(WAREHOUSE)
-    bootstrap(con, SILVER)
+    con = get_connection(WAREHOUSE)
+    bootstrap(con, SILVER, AS_OF)
     ensure_qa(con)
+    load_profiles(con, SILVER, AS_OF)
 
     run_sql(con, 'sql/03_structure_freshness.sql')
     run_sql(con, 'sql/04_quality.sql')
@@ -186,6 +233,7 @@ def main():
     con.execute(f"COPY analytics.kpi_fx_effect       TO '{GOLD_DIR}/kpi_fx_effect.parquet' (FORMAT PARQUET);")
 
     export_qa(con, GOLD_DIR)
+    close_all()     # libera o warehouse para o dashboard logo ao terminar
     print('[VALIDATION] OK — QA e KPIs atualizados.')
 
 if __name__ == '__main__':
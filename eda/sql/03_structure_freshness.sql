@@ -1,36 +1,28 @@
 INSERT OR REPLACE INTO qa.rules VALUES
-('R1_COUNTS','Tabelas possuem linhas (>0)','ERROR','count > 0'),
+('R1_COUNTS','Fatos da Silver possuem linhas (>0)','ERROR','count > 0'),
 ('R2A_FRESHNESS_COSTS','Custos atualizados (mensal)','WARN','lag<=1 mês'),
 ('R2B_FRESHNESS_MANU','Manufatura atualizada (diário)','WARN','lag<=3 dias'),
 ('R2C_FRESHNESS_ENERGY','Energia atualizada (diário)','WARN','lag<=3 dias');
 
+-- contagens e datas máximas vêm de qa.profile (perfil gravado pelo ETL), sem reler os Parquet
 INSERT INTO qa.results
 SELECT * FROM qa_assert(
   'R1_COUNTS',
-  (SELECT (SELECT COUNT(*)>0 FROM dim_date)
-       AND (SELECT COUNT(*)>0 FROM dim_site)
-       AND (SELECT COUNT(*)>0 FROM dim_line)
-       AND (SELECT COUNT(*)>0 FROM dim_product)
-       AND (SELECT COUNT(*)>0 FROM fact_costs)
-       AND (SELECT COUNT(*)>0 FROM fact_manufacturing)
-       AND (SELECT COUNT(*)>0 FROM fact_energy)),
+  (SELECT (SELECT COALESCE(MAX(rows), 0)>0 FROM qa.profile WHERE domain='costs')
+       AND (SELECT COALESCE(MAX(rows), 0)>0 FROM qa.profile WHERE domain='manufacturing')
+       AND (SELECT COALESCE(MAX(rows), 0)>0 FROM qa.profile WHERE domain='energy')),
   (
     SELECT
-      'dim_date='           || (SELECT COUNT(*) FROM dim_date)           || '; ' ||
-      'dim_site='           || (SELECT COUNT(*) FROM dim_site)           || '; ' ||
-      'dim_line='           || (SELECT COUNT(*) FROM dim_line)           || '; ' ||
-      'dim_product='        || (SELECT COUNT(*) FROM dim_product)        || '; ' ||
-      'fact_costs='         || (SELECT COUNT(*) FROM fact_costs)         || '; ' ||
-      'fact_manufacturing=' || (SELECT COUNT(*) FROM fact_manufacturing) || '; ' ||
-      'fact_energy='        || (SELECT COUNT(*) FROM fact_energy)
+      'fact_costs='         || (SELECT COALESCE(MAX(rows), 0) FROM qa.profile WHERE domain='costs')         || '; ' ||
+      'fact_manufacturing=' || (SELECT COALESCE(MAX(rows), 0) FROM qa.profile WHERE domain='manufacturing') || '; ' ||
+      'fact_energy='        || (SELECT COALESCE(MAX(rows), 0) FROM qa.profile WHERE domain='energy')
   ),
-  (SELECT json('[]'))
+  (SELECT json_object('source', (SELECT to_json(list(DISTINCT domain || ':' || source)) FROM qa.profile)))
 );
 
 WITH mx AS (
-  SELECT MAX(d.date) AS max_date
-  FROM fact_costs f
-  JOIN dim_date d USING(date_key)
+  SELECT CAST(CAST(max_value AS TIMESTAMP) AS DATE) AS max_date
+  FROM qa.profile WHERE domain='costs' AND column_name='ref_month'
 ),
 lag AS (
   SELECT date_diff('month', max_date, current_date) AS lag_months FROM mx
@@ -44,9 +36,8 @@ SELECT * FROM qa_assert(
 );
 
 WITH mx AS (
-  SELECT MAX(d.date) AS max_date
-  FROM fact_manufacturing f
-  JOIN dim_date d USING(date_key)
+  SELECT CAST(CAST(max_value AS TIMESTAMP) AS DATE) AS max_date
+  FROM qa.profile WHERE domain='manufacturing' AND column_name='date'
 ),
 lag AS (
   SELECT date_diff('day', max_date, current_date) AS lag_days FROM mx
@@ -60,9 +51,8 @@ SELECT * FROM qa_assert(
 );
 
 WITH mx AS (
-  SELECT MAX(d.date) AS max_date
-  FROM fact_energy f
-  JOIN dim_date d USING(date_key)
+  SELECT CAST(CAST(max_value AS TIMESTAMP) AS DATE) AS max_date
+  FROM qa.profile WHERE domain='energy' AND column_name='timestamp'
 ),
 lag AS (
   SELECT date_diff('day', max_date, current_date) AS lag_days FROM mx
@@ -1,8 +1,54 @@
 import glob
+from typing import Iterator
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+from etl.extract.schema import NULL_STRINGS
+
+
+def list_source_files(pattern: str | list[str]) -> list[str]:
+    # `path` no config pode ser um glob ou uma lista deles (ex.: *.csv, *.csv.gz, *.csv.zst)
+    patterns = [pattern] if isinstance(pattern, str) else pattern
+    return sorted({f for p in patterns for f in glob.glob(p)})     # ordem determinística
+
+
+def _open(path: str) -> pa.NativeFile:
+    # descompressão em streaming pela extensão (.gz, .zst, .bz2, ...); sem arquivo temporário
+    return pa.input_stream(path, compression="detect")
+
+
+def _read_table(path: str, convert: pv.ConvertOptions | None = None) -> pa.Table:
+    with _open(path) as f:
+        return pv.read_csv(f, convert_options=convert)
 
-def load_csv_glob(pattern: str) -> pd.DataFrame:
-    files = glob.glob(pattern)
+
+def _read_frame(path: str) -> pd.DataFrame:
+    with _open(path) as f:
+        return pd.read_csv(f)
+
+
+def load_csv_glob(pattern: str | list[str], convert: pv.ConvertOptions | None = None) -> pd.DataFrame:
+    # os arquivos de uma fonte já são lidos em paralelo em stage_bronze (ingest.workers), um por vez aqui
+    files = list_source_files(pattern)
     if not files:
         return pd.DataFrame()
-    return pd.concat((pd.read_csv(f) for f in files), ignore_index=True)
\ No newline at end of file
+    if convert is None:
+        return pd.concat((_read_frame(f) for f in files), ignore_index=True)
+
+    # com schema declarado o parser do Arrow já entrega os dtypes finais (sem inferência);
+    # self_destruct libera cada coluna Arrow assim que ela é convertida
+    table = pa.concat_tables([_read_table(f, convert) for f in files], promote_options="permissive")
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+def iter_csv_batches(path: str, chunk_bytes: int = 16 << 20,
+                     convert: pv.ConvertOptions | None = None) -> Iterator[pa.RecordBatch]:
+    # leitor incremental: só um bloco de `chunk_bytes` (mais o read-ahead do Arrow) fica em memória
+    with _open(path) as f:
+        reader = pv.open_csv(f, read_options=pv.ReadOptions(block_size=chunk_bytes),
+                             convert_options=convert or pv.ConvertOptions(**NULL_STRINGS))
+        for batch in reader:
+            yield batch
+
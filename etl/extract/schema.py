@@ -0,0 +1,52 @@
+import pyarrow as pa
+import pyarrow.csv as pv
+
+# dtypes aceitos em sources.<domínio>.columns no config.yaml
+DTYPES = {
+    "string": pa.string(),
+    "int64": pa.int64(),
+    "float64": pa.float64(),
+    "bool": pa.bool_(),
+    "timestamp": pa.timestamp("ns"),
+}
+
+def column_types(src: dict) -> dict[str, pa.DataType]:
+    types = {}
+    for col, dtype in (src.get("columns") or {}).items():
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype '{dtype}' da coluna '{col}' não suportado. Use um de {list(DTYPES)}")
+        types[col] = DTYPES[dtype]
+    for col in src.get("categorical") or []:
+        types[col] = pa.dictionary(pa.int32(), pa.string())    # vira Categorical no pandas
+    return types
+
+# campo vazio (com ou sem aspas) vira nulo também nas colunas de texto, como no pd.read_csv
+# e no read_csv do DuckDB; o padrão do Arrow seria ""
+NULL_STRINGS = {"strings_can_be_null": True, "quoted_strings_can_be_null": True}
+
+def csv_convert_options(src: dict) -> pv.ConvertOptions | None:
+    # None = sem schema declarado -> o Arrow infere os tipos como antes
+    types = column_types(src)
+    if not types:
+        return None
+    fmt = src.get("datetime_format")
+    return pv.ConvertOptions(column_types=types, timestamp_parsers=[fmt] if fmt else None, **NULL_STRINGS)
+
+# mesmos dtypes para o read_csv do DuckDB (engine: duckdb); categóricas viram VARCHAR
+DUCKDB_TYPES = {
+    "string": "VARCHAR",
+    "int64": "BIGINT",
+    "float64": "DOUBLE",
+    "bool": "BOOLEAN",
+    "timestamp": "TIMESTAMP",
+}
+
+def duckdb_csv_options(src: dict) -> str:
+    types = {col: DUCKDB_TYPES[dtype] for col, dtype in (src.get("columns") or {}).items()}
+    types.update({col: "VARCHAR" for col in src.get("categorical") or []})
+    if not types:
+        return ""
+    opts = ", types={" + ", ".join(f"'{c}': '{t}'" for c, t in types.items()) + "}"
+    if src.get("datetime_format"):
+        opts += f", timestampformat='{src['datetime_format']}'"
+    return opts
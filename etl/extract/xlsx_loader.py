@@ -0,0 +1,106 @@
+from datetime import date, datetime
+from typing import Iterator
+
+import pyarrow as pa
+
+
+def _column(values: list, dtype: pa.DataType | None) -> pa.Array:
+    if dtype is not None:
+        if pa.types.is_string(dtype):
+            values = [None if v is None else str(v) for v in values]
+        try:
+            return pa.array(values, type=dtype)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise pa.ArrowInvalid(str(e))   # mesmo erro do parser CSV -> fallback sem tipos
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # célula com tipos misturados (ex.: número e texto): mantém como texto
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def _to_batch(header: list[str], rows: list[tuple], types: dict[str, pa.DataType],
+              seen: dict[str, pa.DataType]) -> pa.RecordBatch:
+    cols = list(zip(*rows))
+    arrays = []
+    for i, name in enumerate(header):
+        arr = _column(list(cols[i]), types.get(name))
+        if pa.types.is_null(arr.type) and name in seen:
+            arr = pa.nulls(len(arr), seen[name])   # coluna vazia no chunk: tipo dos chunks anteriores
+        elif not pa.types.is_null(arr.type):
+            seen.setdefault(name, arr.type)
+        arrays.append(arr)
+    return pa.RecordBatch.from_arrays(arrays, names=header)
+
+
+def _rows(ws) -> tuple[list[str], Iterator[tuple]]:
+    rows = ws.iter_rows(values_only=True)
+    # só colunas com cabeçalho, cada uma pela sua posição original na planilha
+    named = [(i, str(c).strip()) for i, c in enumerate(next(rows, ())) if c is not None]
+    header = [name for _, name in named]
+
+    def values():
+        for row in rows:
+            row = tuple(row[i] if i < len(row) else None for i, _ in named)
+            if not all(v is None for v in row):
+                yield row
+    return header, values()
+
+
+def _scalar_type(v) -> pa.DataType:
+    if isinstance(v, bool):
+        return pa.bool_()
+    if isinstance(v, int):
+        return pa.int64()
+    if isinstance(v, float):
+        return pa.float64()
+    if isinstance(v, (datetime, date)):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def _unify(a: pa.DataType | None, b: pa.DataType) -> pa.DataType:
+    if a is None or a == b:
+        return b
+    if {a, b} == {pa.int64(), pa.float64()}:
+        return pa.float64()
+    return pa.string()
+
+
+def xlsx_types(path: str, sheet: str | None = None) -> dict[str, pa.DataType]:
+    # uma passada sem guardar linhas: o tipo de cada coluna olhando a planilha inteira
+    # (colunas vazias ou com valores misturados viram texto)
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        header, rows = _rows(wb[sheet] if sheet else wb.active)
+        types: dict[str, pa.DataType | None] = dict.fromkeys(header)
+        for row in rows:
+            for name, v in zip(header, row):
+                if v is not None:
+                    types[name] = _unify(types[name], _scalar_type(v))
+        return {name: t or pa.string() for name, t in types.items()}
+    finally:
+        wb.close()
+
+
+def iter_xlsx_batches(path: str, chunk_rows: int = 50_000, sheet: str | None = None,
+                      types: dict[str, pa.DataType] | None = None) -> Iterator[pa.RecordBatch]:
+    from openpyxl import load_workbook      # só necessário para fontes kind: xlsx
+
+    # read_only: as linhas são lidas do XML sob demanda, a planilha nunca fica inteira em memória
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        header, rows = _rows(wb[sheet] if sheet else wb.active)
+        seen: dict[str, pa.DataType] = {}
+        buf = []
+        for row in rows:
+            buf.append(row)
+            if len(buf) >= chunk_rows:
+                yield _to_batch(header, buf, types or {}, seen)
+                buf = []
+        if buf:
+            yield _to_batch(header, buf, types or {}, seen)
+    finally:
+        wb.close()
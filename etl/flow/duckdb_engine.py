@@ -0,0 +1,103 @@
+# Engine alternativa (sources.<domínio>.engine: duckdb): Bronze, Silver e cópia da Gold
+# rodam inteiras dentro do DuckDB (read_csv / COPY ... TO), sem trazer linhas para o Python.
+import os
+import shutil
+import duckdb
+from etl.extract.schema import duckdb_csv_options
+from etl.load.to_parquet import DERIVED, remove_part, tmp_path
+from etl.transform.sql import TRANSFORM_SQL
+from etl.utils.duckdb_conn import cursor
+
+def _lit(path: str) -> str:
+    return "'" + str(path).replace("'", "''") + "'"
+
+def _format(options: dict | None) -> str:
+    # mesmas opções de parquet.<domínio>; use_dictionary/write_statistics não existem no COPY do DuckDB
+    options = options or {}
+    out = ["FORMAT PARQUET"]
+    if options.get("compression"):
+        out.append(f"COMPRESSION {options['compression']}")
+    if options.get("compression_level") is not None:
+        out.append(f"COMPRESSION_LEVEL {int(options['compression_level'])}")
+    if options.get("row_group_size"):
+        out.append(f"ROW_GROUP_SIZE {int(options['row_group_size'])}")
+    return ", ".join(out)
+
+def _copy(con, select_sql: str, out_path: str, options: dict | None = None) -> str:
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    # COPY num temporário oculto + rename, como write_table_atomic
+    tmp = tmp_path(out_path)
+    try:
+        con.execute(f"COPY ({select_sql}) TO {_lit(tmp)} ({_format(options)})")
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return out_path
+
+def bronze_file(path: str, out_path: str, src: dict, options: dict | None = None) -> str:
+    con = cursor()      # em memória: só executa o SQL
+    # sem schema declarado a detecção olha o arquivo inteiro, como o pd.read_csv
+    untyped = f"SELECT * FROM read_csv({_lit(path)}, header=true, sample_size=-1)"
+    opts = duckdb_csv_options(src)
+    try:
+        if not opts:
+            return _copy(con, untyped, out_path, options)
+        return _copy(con, f"SELECT * FROM read_csv({_lit(path)}, header=true{opts})", out_path, options)
+    except (duckdb.ConversionException, duckdb.InvalidInputException):
+        if not opts:
+            raise
+        # valor fora do schema declarado: relê sem tipos e deixa a Silver coagir, como o caminho pandas
+        return _copy(con, untyped, out_path, options)
+
+def _copy_partitioned(con, select_sql: str, out_dir: str, filename: str, partition_cols: list[str],
+                      options: dict | None = None) -> list[str]:
+    # o DuckDB grava <tmp>/site_code=SC01/.../data_0.parquet; cada arquivo é renomeado para
+    # <out_dir>/site_code=SC01/.../<filename>, o mesmo layout de write_parquet_partitions
+    derived = [c for c in partition_cols if c in DERIVED]
+    if derived:
+        extra = ", ".join(f"strftime(dt, '{DERIVED[c]}') AS {c}" for c in derived)
+        select_sql = f"SELECT *, {extra} FROM ({select_sql})"
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = os.path.join(out_dir, f".{filename}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    con.execute(f"COPY ({select_sql}) TO {_lit(tmp)} ({_format(options)}, PARTITION_BY ({', '.join(partition_cols)}))")
+
+    out = []
+    for root, _, files in os.walk(tmp):
+        if len(files) > 1:
+            raise RuntimeError(f"DuckDB gerou {len(files)} arquivos na partição {root}; esperado 1")
+        for f in files:
+            dst_dir = os.path.join(out_dir, os.path.relpath(root, tmp))
+            os.makedirs(dst_dir, exist_ok=True)
+            os.replace(os.path.join(root, f), os.path.join(dst_dir, filename))
+            out.append(os.path.join(dst_dir, filename))
+    shutil.rmtree(tmp)
+    remove_part(out_dir, filename, keep=out)     # partições que a nova versão não tem mais
+    return sorted(out)
+
+def silver_file(domain: str, bronze_path: str, out_dir: str, filename: str, cfg: dict,
+                options: dict | None = None) -> list[str]:
+    con = cursor()
+    src = f"read_parquet({_lit(bronze_path)})"
+    columns = [r[0] for r in con.execute(f"DESCRIBE SELECT * FROM {src}").fetchall()]
+    select_sql = TRANSFORM_SQL[domain](src, columns, cfg)
+    partition_cols = cfg["sources"][domain].get("partition_by")
+    if partition_cols:
+        return _copy_partitioned(con, select_sql, out_dir, filename, partition_cols, options)
+    out = [_copy(con, select_sql, os.path.join(out_dir, filename), options)]
+    remove_part(out_dir, filename, keep=out)
+    return out
+
+def copy_file(src_path: str, out_path: str, options: dict | None = None) -> str:
+    return _copy(cursor(), f"SELECT * FROM read_parquet({_lit(src_path)})", out_path, options)
+
+def parts_relation(paths: list[str], drop: list[str] | None = None) -> str:
+    # subconsulta sobre as partes recém-gravadas (colunas de partição vêm do caminho), para perfil
+    # e regras rodarem no DuckDB; `drop` tira colunas que só existem no caminho Hive
+    if not paths:
+        return "(SELECT NULL AS _vazio WHERE false)"     # parte sem linhas: read_parquet([]) não existe
+    files = "[" + ", ".join(_lit(p) for p in paths) + "]"
+    exclude = f" EXCLUDE ({', '.join(drop)})" if drop else ""
+    return f"(SELECT *{exclude} FROM read_parquet({files}, hive_partitioning=true))"
@@ -1,57 +1,338 @@
+import argparse
+import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from prefect import flow, task, get_run_logger
-from etl.extract.csv_loader import load_csv_glob
+from etl.extract.csv_loader import load_csv_glob, iter_csv_batches, list_source_files
+from etl.extract.schema import csv_convert_options, column_types
+from etl.extract.xlsx_loader import iter_xlsx_batches, xlsx_types
+from etl.flow import duckdb_engine, handoff
+from etl.flow.handoff import Part, memory_mode
+from etl.flow.runner import flow, task, get_run_logger, use_local
+from etl.flow.task_cache import bronze_cache_key, cached, gold_cache_key, silver_cache_key
 from etl.transform.energy import transform_energy
 from etl.transform.manufacturing import transform_manuf
 from etl.transform.costs import transform_costs
-from etl.load.to_parquet import write_parquet_partitions
-from etl.load.to_duckdb import upsert_duckdb
-from etl.quality.gx_checks import run_gx_suite
+from etl.load.to_parquet import (
+    DERIVED, WRITE_WORKERS, write_parquet_partitions, write_parquet_stream, write_table_atomic, list_parts, prune_parts,
+    remove_part, parquet_options,
+)
+from etl.load.snapshots import commit_snapshot, expire_snapshots
+from etl.load.to_duckdb import prune_warehouse, tag_part, upsert_duckdb, upsert_frame
+from etl.quality.profile import profile_frame, profile_sql, refresh_profile, save_part_profile
+from etl.quality.rules import run_rules, summary
+from etl.utils.duckdb_conn import configure as configure_duckdb, close_all as close_duckdb
 from etl.utils.io import load_yaml
+from etl.utils.cache import CACHE_DIR, link_or_copy, prune_cache, reflink_or_copy
+from etl.utils.manifest import PENDING, check_stems, layout_key, plan_ingestion, commit_manifest, load_manifest, source_stem
+from etl.utils.metrics import file_bytes, measured, parquet_rows, record, start_run
+
+TRANSFORMS = {
+    "energy": transform_energy,
+    "manufacturing": transform_manuf,
+    "costs": transform_costs,
+}
+
+GOLD_COPY = {"link": link_or_copy, "reflink": reflink_or_copy}
+
+def _gold_copy(cfg: dict, domain: str):
+    # gold_copy.strategy: link/reflink reaproveitam os bytes da Silver; duckdb reescreve com gold_copy.parquet
+    gold = cfg.get("gold_copy") or {}
+    strategy = gold.get("strategy", "link")
+    if strategy == "duckdb":
+        options = {**parquet_options(cfg, domain), **(gold.get("parquet") or {})}
+        return lambda src, dst: duckdb_engine.copy_file(src, dst, options)
+    return GOLD_COPY[strategy]
+
+def _snapshot(cfg: dict, base_dir: str) -> None:
+    # snapshots.enabled: registra a versão da camada para leitura consistente e time travel
+    snaps = cfg.get("snapshots") or {}
+    if snaps.get("enabled", False) and commit_snapshot(base_dir) is not None and snaps.get("keep"):
+        expire_snapshots(base_dir, snaps["keep"])
+
+def _check_quality(domain: str, df: pd.DataFrame | str, cfg: dict, part: str, profile: dict | None = None) -> dict:
+    result = run_rules(domain, df, cfg, profile)
+    msg = f"[{part}] {summary(result)}"
+    if result["success"]:
+        get_run_logger().info(msg)
+    elif (cfg.get("quality") or {}).get("on_error", "raise") == "raise":
+        raise ValueError(f"Qualidade reprovada: {msg}")
+    else:
+        get_run_logger().warning(msg)
+    return result
+
+def _layer_dir(cfg: dict, layer: str, domain: str) -> str:
+    return str(Path(cfg[layer]) / domain)      # <- isolado por domínio
+
+def _engine(cfg: dict, domain: str) -> str:
+    return cfg["sources"][domain].get("engine", "pandas")
+
+def _arrow_handoff(cfg: dict, domain: str) -> bool:
+    # warehouse.handoff: arrow carrega o DuckDB a partir do DataFrame da Silver (só engine pandas)
+    return (cfg.get("warehouse") or {}).get("handoff") == "arrow" and _engine(cfg, domain) == "pandas"
+
+def _source_batches(path: str, src: dict, ingest: dict, typed: bool):
+    if src.get("kind", "csv") == "xlsx":
+        # sem tipos: uma passada prévia fixa o tipo de cada coluna para todos os chunks
+        types = column_types(src) if typed else xlsx_types(path, src.get("sheet"))
+        return iter_xlsx_batches(path, chunk_rows=int(ingest.get("chunk_rows", 50_000)), sheet=src.get("sheet"), types=types)
+    convert = csv_convert_options(src) if typed else None
+    return iter_csv_batches(path, chunk_bytes=int(ingest.get("chunk_mb", 16)) << 20, convert=convert)
+
+def _write_bronze(path: str, bronze_dir: str, filename: str, ingest: dict, src: dict, typed: bool, options: dict) -> str:
+    # planilhas sempre seguem pelo caminho em chunks, nunca são carregadas inteiras
+    if ingest.get("mode", "frame") == "stream" or src.get("kind", "csv") == "xlsx":
+        batches = _source_batches(path, src, ingest, typed)
+        return write_parquet_stream(batches, base_dir=bronze_dir, filename=filename, options=options)
+    convert = csv_convert_options(src) if typed else None
+    df = load_csv_glob(path, convert=convert)
+    return write_parquet_partitions(df, base_dir=bronze_dir, filename=filename, options=options)[0]
+
+def _parse_file(path: str, out_dir: str, filename: str, ingest: dict, src: dict, options: dict) -> str:
+    if src.get("engine", "pandas") == "duckdb" and src.get("kind", "csv") == "csv":
+        return duckdb_engine.bronze_file(path, os.path.join(out_dir, filename), src, options)
+    try:
+        return _write_bronze(path, out_dir, filename, ingest, src, typed=True, options=options)
+    except pa.ArrowInvalid:
+        # valor fora do schema declarado, ou do tipo que o stream inferiu no primeiro bloco
+        # (ex.: 1.5 depois de 200k inteiros): relê sem tipos e deixa a Silver coagir (errors="coerce")
+        if src.get("kind", "csv") == "xlsx":
+            return _write_bronze(path, out_dir, filename, ingest, src, typed=False, options=options)
+        # CSV: o pandas infere os tipos olhando o arquivo inteiro, não só o primeiro bloco
+        return write_parquet_partitions(load_csv_glob(path), base_dir=out_dir, filename=filename, options=options)[0]
+
+def _ingest_file(path: str, bronze_dir: str, ingest: dict, src: dict, key: str, options: dict) -> str:
+    # cada arquivo de origem vira uma parte bronze/<domínio>/<arquivo>.parquet, ligada ao
+    # objeto _cas/<hash do conteúdo>.parquet; se o objeto já existe (retry, rerun) não há parse
+    cache_dir = os.path.join(bronze_dir, CACHE_DIR)
+    obj = os.path.join(cache_dir, f"{key}.parquet")
+    if not os.path.exists(obj):
+        os.replace(_parse_file(path, cache_dir, f"{key}.parquet.tmp", ingest, src, options), obj)
+    return link_or_copy(obj, os.path.join(bronze_dir, f"{source_stem(path)}.parquet"))
+
+def _read_source(path: str, src: dict, ingest: dict) -> pa.Table:
+    # handoff memory: sempre pelos chunks (modo stream), concatenados numa tabela só
+    try:
+        return pa.Table.from_batches(list(_source_batches(path, src, ingest, typed=True)))
+    except pa.ArrowInvalid:
+        if src.get("kind", "csv") == "xlsx":
+            return pa.Table.from_batches(list(_source_batches(path, src, ingest, typed=False)))
+        return pa.Table.from_pandas(load_csv_glob(path), preserve_index=False)
+
+def _persist_bronze(table: pa.Table, obj: str, bronze_dir: str, path: str, options: dict) -> str:
+    if not os.path.exists(obj):
+        write_table_atomic(table, obj, options)
+    return link_or_copy(obj, os.path.join(bronze_dir, f"{source_stem(path)}.parquet"))
+
+def _bronze_part(path: str, bronze_dir: str, ingest: dict, src: dict, key: str, options: dict) -> Part:
+    # a tabela segue já para a Silver; o objeto _cas e o link da parte são gravados em segundo plano
+    cache_dir = os.path.join(bronze_dir, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    obj = os.path.join(cache_dir, f"{key}.parquet")
+    table = pq.read_table(obj) if os.path.exists(obj) else _read_source(path, src, ingest)
+    return Part(f"{source_stem(path)}.parquet", table, handoff.persist(_persist_bronze, table, obj, bronze_dir, path, options))
 
 @task(retries=2, retry_delay_seconds=30)
+@measured("bronze")
 def stage_bronze(domain: str, cfg: dict):
     pattern = cfg["sources"][domain]["path"]
-    df = load_csv_glob(pattern)
-    bronze_dir = str(Path(cfg["bronze"]) / domain)      # <- isolado por domínio
-    return write_parquet_partitions(df, base_dir=bronze_dir, filename=f"{domain}.parquet")
+    ingest = cfg.get("ingest", {})
+    bronze_dir = _layer_dir(cfg, "bronze", domain)
+    files = list_source_files(pattern)
+    check_stems(files)
+    src = cfg["sources"][domain]
+    options = parquet_options(cfg, domain)
+    # só novos/alterados desde o último run, inclusive por mudança de schema ou layout no config
+    pending = plan_ingestion(files, bronze_dir, src, layout_key(src, options))
+    if not ingest.get("incremental", True):
+        pending = files
+    prune_parts(bronze_dir, keep={source_stem(f) for f in files})
 
-@task
-def stage_silver(domain: str, bronze_parquet: str, cfg: dict):
-    if domain == "energy":
-        df = transform_energy(bronze_parquet, cfg)
-    elif domain == "manufacturing":
-        df = transform_manuf(bronze_parquet, cfg)
+    fps = load_manifest(bronze_dir, PENDING)
+    keys = {f: fps[f]["key"] for f in files}
+
+    memory = memory_mode(cfg, domain)
+    ingest_file = _bronze_part if memory else _ingest_file
+    pool = ProcessPoolExecutor if ingest.get("executor") == "process" and not memory else ThreadPoolExecutor
+    with pool(max_workers=max(1, ingest.get("workers", 1))) as ex:
+        n = len(pending)
+        parts = list(ex.map(ingest_file, pending, [bronze_dir] * n, [ingest] * n, [src] * n,
+                            [keys[f] for f in pending], [options] * n))
+    rows = sum(p.table.num_rows for p in parts) if memory else parquet_rows(parts)
+    record(rows_in=rows, rows_out=rows, bytes_read=file_bytes(pending), bytes_written=0 if memory else file_bytes(parts))
+    cache_dir = os.path.join(bronze_dir, CACHE_DIR)
+    if memory:
+        # o prune do _cas apagaria os temporários das gravações em andamento: roda depois delas
+        handoff.finalize("bronze", domain, [p.written for p in parts], prune_cache, cache_dir, set(keys.values()))
     else:
-        df = transform_costs(bronze_parquet, cfg)
-    run_gx_suite(domain, df)        
-    silver_dir = str(Path(cfg["silver"]) / domain)      # <- isolado por domínio
-    return write_parquet_partitions(df, base_dir=silver_dir, filename=f"{domain}.parquet")
+        prune_cache(cache_dir, keep=set(keys.values()))
+    return parts
 
 @task
-def stage_gold(domain: str, silver_parquet: str, cfg: dict):
-    # 1) mantém upsert no DuckDB
-    msg = upsert_duckdb(domain, silver_parquet, cfg)
+@measured("silver")
+def stage_silver(domain: str, bronze_parts: list, cfg: dict):
+    silver_dir = _layer_dir(cfg, "silver", domain)
+    partition_cols = cfg["sources"][domain].get("partition_by")
+    options = parquet_options(cfg, domain)
+    workers = cfg.get("ingest", {}).get("write_workers", WRITE_WORKERS)
+    memory = memory_mode(cfg, domain)
+    if memory:
+        # as regras de referência leem a Silver de outros domínios do disco
+        for dep in _silver_deps(cfg, domain):
+            handoff.wait("silver", dep)
+    out = []
+    for bronze_parquet in bronze_parts:
+        filename = bronze_parquet.filename if memory else os.path.basename(bronze_parquet)
+        duckdb = _engine(cfg, domain) == "duckdb"
+        if memory:
+            record(rows_in=bronze_parquet.table.num_rows)
+        else:
+            record(rows_in=parquet_rows([bronze_parquet]), bytes_read=file_bytes([bronze_parquet]))
+        if duckdb:
+            parts = duckdb_engine.silver_file(domain, bronze_parquet, silver_dir, filename, cfg, options)
+            # perfil e regras em SQL sobre as partes gravadas; derivadas de `dt` (year/month) voltam
+            # pelo caminho Hive, mas não fazem parte dos dados
+            df = duckdb_engine.parts_relation(parts, [c for c in partition_cols or [] if c in DERIVED])
+            profile = profile_sql(df)
+        else:
+            df = TRANSFORMS[domain](bronze_parquet.table if memory else bronze_parquet, cfg)
+            # perfil por coluna no mesmo DataFrame das regras: nulos e min/max servem às duas coisas
+            profile = profile_frame(df)
+        record(rows_out=profile["rows"])
+        _check_quality(domain, df, cfg, filename, profile)
+        save_part_profile(silver_dir, source_stem(filename), profile)
+        if duckdb:
+            out += parts
+            continue
+        if _arrow_handoff(cfg, domain):
+            get_run_logger().info(upsert_frame(domain, df, cfg, part=source_stem(filename)))
+        if memory:
+            written = handoff.persist(write_parquet_partitions, df, base_dir=silver_dir, filename=filename,
+                                      partition_cols=partition_cols, options=options, workers=workers)
+            out.append(Part(filename, pa.Table.from_pandas(df, preserve_index=False), written))
+            continue
+        out += write_parquet_partitions(df, base_dir=silver_dir, filename=filename, partition_cols=partition_cols,
+                                        options=options, workers=workers)
+    if not memory:
+        record(bytes_written=file_bytes(out))
+    if memory:
+        # o prune compara com as partes da Bronze: espera a Bronze estar em disco
+        handoff.finalize("silver", domain, handoff.done("bronze", domain) + [p.written for p in out],
+                         _finish_silver, cfg, domain)
+    else:
+        _finish_silver(cfg, domain)
+    return out
 
-    # 2) salva também como Parquet em data/gold/<domínio>/<domínio>.parquet
-    gold_dir = str(Path(cfg["gold"]) / domain)
-    df = pd.read_parquet(silver_parquet)
-    _ = write_parquet_partitions(df, base_dir=gold_dir, filename=f"{domain}.parquet")
+def _finish_silver(cfg: dict, domain: str) -> None:
+    silver_dir = _layer_dir(cfg, "silver", domain)
+    prune_parts(silver_dir, keep=list_parts(_layer_dir(cfg, "bronze", domain)))
+    refresh_profile(silver_dir, keep=list_parts(silver_dir))
+    _snapshot(cfg, silver_dir)
+
+@task
+@measured("gold")
+def stage_gold(domain: str, silver_parts: list, cfg: dict):
+    # 1) mantém upsert no DuckDB (apenas as partes novas/alteradas); no hand-off arrow já foi feito na Silver
+    memory = memory_mode(cfg, domain)
+    rows = sum(p.table.num_rows for p in silver_parts) if memory else parquet_rows(silver_parts)
+    record(rows_in=rows, rows_out=rows)
+    if _arrow_handoff(cfg, domain):
+        msg = f"{domain}: carregado no DuckDB via Arrow na Silver"
+    elif memory:
+        tables = [tag_part(p.table, source_stem(p.filename)) for p in silver_parts]
+        msg = upsert_frame(domain, pa.concat_tables(tables, promote_options="permissive") if tables else pa.table({}), cfg)
+    else:
+        msg = upsert_duckdb(domain, silver_parts, cfg)
 
+    # 2) e 3) Parquet da Gold e manifesto; no handoff memory, depois que a Silver estiver em disco
+    if memory:
+        handoff.finalize("gold", domain, handoff.done("silver", domain),
+                         lambda: _persist_gold(cfg, domain, [p for part in silver_parts for p in part.written.result()]))
+    else:
+        record(bytes_read=file_bytes(silver_parts), bytes_written=_persist_gold(cfg, domain, silver_parts))
     return msg
 
+def _persist_gold(cfg: dict, domain: str, silver_parts: list[str]) -> int:
+    # 2) salva também como Parquet em data/gold/<domínio>/, no mesmo layout de partições da Silver
+    silver_dir = _layer_dir(cfg, "silver", domain)
+    gold_dir = _layer_dir(cfg, "gold", domain)
+    copy = _gold_copy(cfg, domain)
+    written = 0
+    for filename in {os.path.basename(p) for p in silver_parts}:
+        remove_part(gold_dir, filename)
+    for silver_parquet in silver_parts:
+        out_path = os.path.join(gold_dir, os.path.relpath(silver_parquet, silver_dir))
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        copy(silver_parquet, out_path)      # nenhum DataFrame é materializado na Gold
+        written += os.path.getsize(out_path)
+    keep = list_parts(silver_dir)
+    prune_parts(gold_dir, keep=keep)
+    prune_warehouse(domain, cfg, keep)      # fontes removidas saem também do DuckDB
+    _snapshot(cfg, gold_dir)
+
+    # 3) run completo para o domínio: promove o manifesto de ingestão
+    commit_manifest(_layer_dir(cfg, "bronze", domain))
+    return written
+
+DOMAINS = ["energy", "manufacturing", "costs"]
+
+def _silver_deps(cfg: dict, domain: str) -> list[str]:
+    # quality.rules.<domínio>.references lê a Silver de outro domínio: essa Silver vem antes
+    refs = (((cfg.get("quality") or {}).get("rules") or {}).get(domain) or {}).get("references") or []
+    return [r["domain"] for r in refs if r["domain"] in DOMAINS and r["domain"] != domain]
+
+def _domain_order(cfg: dict) -> list[str]:
+    # ordem topológica pelas dependências de Silver (ciclo: erro de configuração)
+    order, pending = [], list(DOMAINS)
+    while pending:
+        ready = [d for d in pending if all(dep in order for dep in _silver_deps(cfg, d))]
+        if not ready:
+            raise ValueError(f"Dependência circular em quality.rules.*.references: {pending}")
+        order += ready
+        pending = [d for d in pending if d not in ready]
+    return order
+
 @flow(name="etl_whirlpool_core")
 def etl_core(config_path: str = "configs/config.yaml"):
     cfg = load_yaml(config_path)
+    configure_duckdb(cfg)
+    handoff.configure(cfg)
+    run_id = start_run()        # chave das linhas de ops.stage_metrics deste run
     logger = get_run_logger()
-    for domain in ["energy", "manufacturing", "costs"]:
-        b = stage_bronze.submit(domain, cfg)
-        logger.info(f"Bronze path for {domain}: {b.result()}")
-        s = stage_silver.submit(domain, b.result(), cfg)
-        logger.info(f"Silver path for {domain}: {s.result()}")
-        g = stage_gold.submit(domain, s.result(), cfg)
-        logger.info(f"Gold updated for {domain}: {g.result()}")
+    logger.info(f"run_id: {run_id}")
+    try:
+        # DAG: bronze→silver→gold por domínio, os domínios em paralelo no task runner; nada espera
+        # por .result() no meio. A escrita no DuckDB é serializada em to_duckdb (write_lock).
+        # task_cache: estágio com entradas, cfg e código iguais devolve as partes do run anterior
+        bronze_task = cached(stage_bronze, cfg, bronze_cache_key)
+        silver_task = cached(stage_silver, cfg, silver_cache_key)
+        gold_task = cached(stage_gold, cfg, gold_cache_key)
+        bronze, silver, gold = {}, {}, {}
+        for domain in _domain_order(cfg):
+            bronze[domain] = bronze_task.submit(domain, cfg)
+            silver[domain] = silver_task.submit(domain, bronze[domain], cfg,
+                                                wait_for=[silver[d] for d in _silver_deps(cfg, domain)])
+            gold[domain] = gold_task.submit(domain, silver[domain], cfg)
+        for domain in DOMAINS:
+            logger.info(f"Bronze parts for {domain}: {bronze[domain].result()}")
+            logger.info(f"Silver parts for {domain}: {silver[domain].result()}")
+            logger.info(f"Gold updated for {domain}: {gold[domain].result()}")
+    finally:
+        try:
+            handoff.drain()     # handoff memory: o flow só termina com tudo gravado
+        finally:
+            close_duckdb()      # solta o lock de escrita do warehouse assim que o flow termina
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Roda o ETL bronze→silver→gold")
+    parser.add_argument("--config", default="configs/config.yaml")
+    parser.add_argument("--local", action="store_true", help="executor local, sem importar o Prefect")
+    args = parser.parse_args(argv)
+    if args.local:
+        use_local()
+    etl_core(args.config)
 
 if __name__ == "__main__":
-    etl_core()
+    main()
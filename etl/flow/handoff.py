@@ -0,0 +1,83 @@
+# handoff.mode: memory — bronze→silver→gold passam tabelas Arrow adiante e o Parquet é gravado
+# em segundo plano. Cada camada/domínio tem uma finalização (prune, perfil, snapshot) que espera
+# as próprias gravações e a da camada anterior; drain() no fim do flow garante a durabilidade.
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pyarrow as pa
+
+@dataclass
+class Part:
+    filename: str       # nome da parte nas camadas (energy_202504.parquet)
+    table: pa.Table = field(repr=False)
+    written: Future = field(repr=False)     # caminho(s) gravados em disco
+
+_lock = threading.Lock()
+_workers = 4
+_writers: ThreadPoolExecutor | None = None
+_done: dict[tuple[str, str], Future] = {}
+_pending: list[Future] = []
+
+def memory_mode(cfg: dict, domain: str) -> bool:
+    # só engine pandas: a engine duckdb já não materializa nada no Python
+    mode = (cfg.get("handoff") or {}).get("mode", "files")
+    return mode == "memory" and cfg["sources"][domain].get("engine", "pandas") == "pandas"
+
+def configure(cfg: dict) -> None:
+    global _workers
+    _workers = int((cfg.get("handoff") or {}).get("persist_workers", 4))
+
+def persist(fn, *args, **kwargs) -> Future:
+    # gravações independentes: pool fixo, nenhuma delas espera por outra
+    global _writers
+    with _lock:
+        if _writers is None:
+            _writers = ThreadPoolExecutor(max_workers=max(1, _workers), thread_name_prefix="persist")
+        fut = _writers.submit(fn, *args, **kwargs)
+        _pending.append(fut)
+    return fut
+
+def finalize(layer: str, domain: str, futures: list[Future], fn, *args) -> Future:
+    # roda fn depois de `futures` numa thread própria (esperar dentro do pool poderia travá-lo)
+    out = Future()
+
+    def run():
+        try:
+            for f in futures:
+                f.result()
+            out.set_result(fn(*args))
+        except BaseException as e:
+            out.set_exception(e)
+
+    with _lock:
+        _done[(layer, domain)] = out
+        _pending.append(out)
+    threading.Thread(target=run, name=f"finalize-{layer}-{domain}").start()
+    return out
+
+def done(layer: str, domain: str) -> list[Future]:
+    with _lock:
+        fut = _done.get((layer, domain))
+    return [fut] if fut else []
+
+def wait(layer: str, domain: str) -> None:
+    for fut in done(layer, domain):
+        fut.result()
+
+def drain() -> None:
+    # espera tudo o que foi agendado; o primeiro erro de gravação sobe para o flow
+    global _writers
+    with _lock:
+        pending, writers = list(_pending), _writers
+        _pending.clear()
+        _done.clear()
+        _writers = None
+    try:
+        for fut in pending:
+            fut.exception()
+        for fut in pending:
+            fut.result()
+    finally:
+        if writers is not None:
+            writers.shutdown(wait=True)
@@ -0,0 +1,189 @@
+# Decoradores task/flow com o Prefect aplicado só na primeira execução. Sem Prefect instalado,
+# com --local (use_local) ou ETL_RUNNER=local, o DAG roda no executor local abaixo: threads,
+# retries, cache por cache_key_fn e log padrão, sem o custo de importar o Prefect.
+import functools
+import importlib.util
+import inspect
+import logging
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+
+WORKERS = 8
+RESULTS_DIR = os.path.join(os.path.expanduser("~"), ".cache", "etl", "results")     # cache_key_fn no modo local
+
+logger = logging.getLogger("etl.flow")
+PREFECT = importlib.util.find_spec("prefect") is not None     # só localiza, não importa
+_local = os.environ.get("ETL_RUNNER") == "local"
+_state = threading.local()
+
+def use_local(flag: bool = True) -> None:
+    global _local
+    _local = flag
+
+def is_local() -> bool:
+    return _local or not PREFECT
+
+def get_run_logger():
+    if is_local():
+        return logger
+    from prefect import get_run_logger
+    return get_run_logger()
+
+class LocalFuture:
+    def __init__(self, name: str, fut: Future):
+        self.name = name
+        self.fut = fut
+
+    def result(self):
+        return self.fut.result()
+
+    def wait(self) -> None:
+        self.fut.exception()
+
+class LocalRunner:
+    def __init__(self, workers: int = WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="task")
+
+    def submit(self, task: "Task", args: tuple, kwargs: dict, wait_for: list) -> LocalFuture:
+        # a task só entra no pool quando as upstream terminam: nenhuma thread fica presa esperando
+        upstream = [f for f in [*args, *kwargs.values(), *wait_for] if isinstance(f, LocalFuture)]
+        out = Future()
+        remaining = [len(upstream)]
+        lock = threading.Lock()
+
+        def start():
+            failed = next((f for f in upstream if f.fut.exception() is not None), None)
+            if failed is not None:
+                out.set_exception(RuntimeError(f"{task.name}: upstream {failed.name} falhou"))
+                return
+            a = [f.result() if isinstance(f, LocalFuture) else f for f in args]
+            k = {n: f.result() if isinstance(f, LocalFuture) else f for n, f in kwargs.items()}
+            try:
+                done = self.pool.submit(task.run, a, k)
+            except RuntimeError as e:      # flow já encerrado por erro em outra task
+                out.set_exception(e)
+                return
+            done.add_done_callback(lambda d: out.set_exception(d.exception()) if d.exception() else out.set_result(d.result()))
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                start()
+
+        if not upstream:
+            start()
+        for f in upstream:
+            f.fut.add_done_callback(on_done)
+        return LocalFuture(task.name, out)
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True)
+
+class Task:
+    def __init__(self, fn, **options):
+        self.fn = fn
+        self.name = options.get("name") or fn.__name__
+        self.options = options
+        self._prefect = None
+        functools.update_wrapper(self, fn)
+
+    def with_options(self, **options) -> "Task":
+        return Task(self.fn, **{**self.options, **options})
+
+    def prefect(self):
+        if self._prefect is None:
+            from prefect import task
+            self._prefect = task(self.fn, **self.options)
+        return self._prefect
+
+    def __call__(self, *args, **kwargs):
+        return self.fn(*args, **kwargs) if is_local() else self.prefect()(*args, **kwargs)
+
+    def submit(self, *args, wait_for: list | None = None, **kwargs):
+        if not is_local():
+            return self.prefect().submit(*args, wait_for=wait_for, **kwargs)
+        runner = getattr(_state, "runner", None)
+        if runner is None:
+            raise RuntimeError(f"{self.name}.submit fora de um flow")
+        return runner.submit(self, args, kwargs, wait_for or [])
+
+    def run(self, args: list, kwargs: dict):
+        key_fn = self.options.get("cache_key_fn")
+        key = key_fn(None, dict(inspect.signature(self.fn).bind(*args, **kwargs).arguments)) if key_fn else None
+        if key is not None:
+            hit = _load_result(key)
+            if hit is not None:
+                logger.info(f"{self.name}: cache {key[:24]}")
+                return hit[0]
+        retries, delay = self.options.get("retries", 0), self.options.get("retry_delay_seconds", 0)
+        for attempt in range(retries + 1):
+            t0 = time.perf_counter()
+            try:
+                result = self.fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == retries:
+                    logger.error(f"{self.name}: falhou após {attempt + 1} tentativa(s): {e!r}")
+                    raise
+                logger.warning(f"{self.name}: tentativa {attempt + 1} falhou ({e!r}); nova em {delay}s")
+                time.sleep(delay)
+                continue
+            logger.info(f"{self.name}: ok em {time.perf_counter() - t0:.2f}s")
+            if key is not None:
+                _save_result(key, result, self.options.get("cache_expiration"))
+            return result
+
+def _result_path(key: str) -> str:
+    return os.path.join(RESULTS_DIR, f"{key}.pkl")
+
+def _load_result(key: str) -> tuple | None:
+    try:
+        with open(_result_path(key), "rb") as f:
+            expires, result = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    return None if expires is not None and expires < time.time() else (result,)
+
+def _save_result(key: str, result, expiration: timedelta | None) -> None:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = _result_path(key)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump((time.time() + expiration.total_seconds() if expiration else None, result), f)
+    os.replace(tmp, path)
+
+class Flow:
+    def __init__(self, fn, **options):
+        self.fn = fn
+        self.options = options
+        self._prefect = None
+        functools.update_wrapper(self, fn)
+
+    def __call__(self, *args, **kwargs):
+        if not is_local():
+            if self._prefect is None:
+                from prefect import flow
+                self._prefect = flow(self.fn, **self.options)
+            return self._prefect(*args, **kwargs)
+        if not logging.getLogger().handlers:
+            logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(threadName)s %(message)s")
+        logger.setLevel(logging.INFO)
+        _state.runner = LocalRunner(self.options.get("workers", WORKERS))
+        t0 = time.perf_counter()
+        try:
+            return self.fn(*args, **kwargs)
+        finally:
+            _state.runner.shutdown()
+            _state.runner = None
+            logger.info(f"{self.options.get('name', self.fn.__name__)}: fim em {time.perf_counter() - t0:.2f}s")
+
+def task(fn=None, **options):
+    return Task(fn, **options) if fn else lambda f: Task(f, **options)
+
+def flow(fn=None, **options):
+    return Flow(fn, **options) if fn else lambda f: Flow(f, **options)
@@ -0,0 +1,225 @@
+# Chaves de cache das tasks bronze/silver/gold: entradas + seção do cfg + versão do código.
+# Com as mesmas três, o Prefect devolve o resultado anterior (lista de partes) sem rodar a task,
+# desde que a camada gravada por ela esteja como ficou no fim daquele run; se alguma parte foi
+# regravada, removida ou compactada depois, a chave muda e a task roda de novo.
+#
+#   python -m etl.flow.task_cache                       # invalida todos os domínios
+#   python -m etl.flow.task_cache --domain energy costs
+#   python -m etl.flow.task_cache --show
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import uuid
+from datetime import timedelta
+from importlib.util import find_spec
+from pathlib import Path
+
+from etl.extract.csv_loader import list_source_files
+from etl.load.to_parquet import part_dirs
+from etl.utils.io import load_yaml
+from etl.utils.manifest import MANIFEST, fingerprint, load_manifest
+
+DOMAINS = ["energy", "manufacturing", "costs"]
+SALT_FILE = "_task_cache.json"      # na raiz da Bronze; trocar o sal invalida as chaves
+RESULTS_DIR = "_task_results"       # ao lado do sal: chave e estado da camada de cada resultado
+KEEP_RESULTS = 50                   # entradas guardadas por estágio/domínio
+
+# módulos cujo código define a saída de cada estágio (a versão é o hash dos fontes)
+CODE = {
+    "bronze": ["etl.flow.etl_core", "etl.extract.csv_loader", "etl.extract.schema", "etl.extract.xlsx_loader",
+               "etl.flow.duckdb_engine", "etl.load.to_parquet", "etl.utils.cache", "etl.utils.manifest"],
+    "silver": ["etl.flow.etl_core", "etl.transform.energy", "etl.transform.manufacturing", "etl.transform.costs",
+               "etl.transform.sql", "etl.flow.duckdb_engine", "etl.load.to_parquet", "etl.quality.rules",
+               "etl.quality.profile", "etl.load.snapshots"],
+    "gold": ["etl.flow.etl_core", "etl.load.to_duckdb", "etl.load.to_parquet", "etl.load.snapshots",
+             "etl.flow.duckdb_engine", "etl.utils.cache", "etl.utils.manifest"],
+}
+
+# seções do cfg lidas por cada estágio (sources/parquet são recortados por domínio)
+CFG_KEYS = {
+    "bronze": ["ingest", "bronze"],
+    "silver": ["ingest", "silver", "quality", "snapshots"],
+    "gold": ["silver", "gold", "gold_copy", "snapshots", "duckdb_path", "warehouse"],
+}
+
+_code_cache: dict[str, str] = {}
+_chosen: dict[tuple[str, str], tuple[str, str]] = {}    # (estágio, domínio) -> (chave das entradas, chave usada)
+_lock = threading.Lock()
+
+def _sha(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+def code_version(stage: str) -> str:
+    if stage not in _code_cache:
+        h = hashlib.sha256()
+        for name in CODE[stage]:
+            h.update(Path(find_spec(name).origin).read_bytes())
+        _code_cache[stage] = h.hexdigest()
+    return _code_cache[stage]
+
+def cfg_hash(cfg: dict, stage: str, domain: str) -> str:
+    parquet = cfg.get("parquet") or {}
+    section = {k: cfg.get(k) for k in CFG_KEYS[stage]}
+    section["sources"] = cfg["sources"][domain]
+    section["parquet"] = [parquet.get("default"), parquet.get(domain)]
+    return _sha(section)
+
+def _files_hash(paths: list[str]) -> str:
+    # partes geradas pelo ETL são sempre trocadas por rename: inode/tamanho/mtime bastam;
+    # parte que sumiu (compactação, prune) muda a chave em vez de derrubar a task
+    stats = []
+    for p in sorted(paths):
+        try:
+            st = os.stat(p)
+        except FileNotFoundError:
+            stats.append([p, None])
+            continue
+        stats.append([p, st.st_ino, st.st_size, st.st_mtime_ns])
+    return _sha(stats)
+
+def _layer_hash(cfg: dict, layer: str, domain: str) -> str:
+    # todas as partes da camada do domínio (sem _cas/, _snapshots/ e temporários)
+    base = os.path.join(cfg[layer], domain)
+    return _files_hash([os.path.join(root, f) for root, files in part_dirs(base) for f in files if f.endswith(".parquet")])
+
+def _sources_hash(cfg: dict, domain: str) -> str:
+    # conteúdo dos arquivos de origem; o manifesto evita reler o que não mudou de tamanho/mtime
+    bronze_dir = os.path.join(cfg["bronze"], domain)
+    old = load_manifest(bronze_dir, MANIFEST)
+    files = list_source_files(cfg["sources"][domain]["path"])
+    return _sha({f: fingerprint(f, old.get(f))["sha256"] for f in files})
+
+def _salt_path(cfg: dict) -> str:
+    return (cfg.get("task_cache") or {}).get("salt_file") or os.path.join(cfg["bronze"], SALT_FILE)
+
+def load_salts(cfg: dict) -> dict:
+    path = _salt_path(cfg)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def invalidate(cfg: dict, domains: list[str] = DOMAINS) -> dict:
+    salts = load_salts(cfg)
+    salts.update({d: uuid.uuid4().hex for d in domains})
+    path = _salt_path(cfg)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(salts, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return salts
+
+def _key(stage: str, domain: str, cfg: dict, inputs: str) -> str:
+    salt = load_salts(cfg).get(domain, "")
+    return f"{stage}-{domain}-" + _sha([inputs, cfg_hash(cfg, stage, domain), code_version(stage), salt])
+
+def _inputs(stage: str, parameters: dict) -> str:
+    # só o que vem de cima: origem na Bronze; partes recebidas + camada anterior (base do prune) nas demais
+    domain, cfg = parameters["domain"], parameters["cfg"]
+    if stage == "bronze":
+        return _sources_hash(cfg, domain)
+    upstream, parts = ("bronze", "bronze_parts") if stage == "silver" else ("silver", "silver_parts")
+    return _sha([_files_hash(parameters[parts]), _layer_hash(cfg, upstream, domain)])
+
+def _results_path(cfg: dict, stage: str, domain: str) -> str:
+    return os.path.join(os.path.dirname(_salt_path(cfg)), RESULTS_DIR, f"{stage}-{domain}.json")
+
+def _load_results(cfg: dict, stage: str, domain: str) -> dict:
+    path = _results_path(cfg, stage, domain)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def _save_result(cfg: dict, stage: str, domain: str, inputs_key: str, key: str) -> None:
+    # estado da camada gravada pela task ao terminar: um acerto só vale se ela continua igual
+    results = _load_results(cfg, stage, domain)
+    results.pop(inputs_key, None)
+    results[inputs_key] = {"key": key, "layer": _layer_hash(cfg, stage, domain)}
+    path = _results_path(cfg, stage, domain)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(dict(list(results.items())[-KEEP_RESULTS:]), f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _cache_key(stage: str, parameters: dict) -> str:
+    # chave = entradas + cfg + código; se a camada que a task grava mudou desde o fim do run que
+    # produziu o resultado (parte regravada, removida, compactada), troca por uma chave nova (miss)
+    domain, cfg = parameters["domain"], parameters["cfg"]
+    inputs_key = _key(stage, domain, cfg, _inputs(stage, parameters))
+    saved = _load_results(cfg, stage, domain).get(inputs_key)
+    if saved is not None and saved["layer"] == _layer_hash(cfg, stage, domain):
+        key = saved["key"]
+    else:
+        key = f"{inputs_key}-{uuid.uuid4().hex[:12]}"
+    with _lock:
+        _chosen[(stage, domain)] = (inputs_key, key)
+    return key
+
+# assinatura de cache_key_fn do Prefect: (contexto da task, parâmetros já resolvidos)
+def bronze_cache_key(context, parameters: dict) -> str:
+    return _cache_key("bronze", parameters)
+
+def silver_cache_key(context, parameters: dict) -> str:
+    return _cache_key("silver", parameters)
+
+def gold_cache_key(context, parameters: dict) -> str:
+    return _cache_key("gold", parameters)
+
+STAGES = {bronze_cache_key: "bronze", silver_cache_key: "silver", gold_cache_key: "gold"}
+
+def _recorded(fn, stage: str):
+    # roda a task e registra com que chave e em que estado da camada o resultado foi produzido
+    sig = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        params = sig.bind(*args, **kwargs).arguments
+        out = fn(*args, **kwargs)
+        with _lock:
+            chosen = _chosen.pop((stage, params["domain"]), None)
+        if chosen is not None:
+            _save_result(params["cfg"], stage, params["domain"], *chosen)
+        return out
+    return run
+
+def _no_cache():
+    if find_spec("prefect") is None:
+        return None         # executor local: ignora a opção
+    from prefect.cache_policies import NO_CACHE
+    return NO_CACHE
+
+def cached(task, cfg: dict, key_fn):
+    # task_cache.enabled: aplica a chave e a expiração (task_cache.expiration_hours) à task
+    # handoff.mode: memory devolve tabelas em memória, que não servem de resultado para outro run
+    opts = cfg.get("task_cache") or {}
+    if (cfg.get("handoff") or {}).get("mode") == "memory":
+        # sem isso a política padrão do Prefect (INPUTS) tenta serializar as Part (tabela Arrow,
+        # Future) e loga um erro de chave de cache a cada task
+        return task.with_options(cache_policy=_no_cache(), persist_result=False)
+    if not opts.get("enabled", False):
+        return task
+    hours = opts.get("expiration_hours")
+    return type(task)(_recorded(task.fn, STAGES[key_fn]), **{
+        **task.options, "cache_key_fn": key_fn, "persist_result": True,
+        "cache_expiration": timedelta(hours=hours) if hours else None})
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description="Invalida o cache das tasks bronze/silver/gold")
+    parser.add_argument("--config", default="configs/config.yaml")
+    parser.add_argument("--domain", nargs="+", choices=DOMAINS, default=DOMAINS)
+    parser.add_argument("--show", action="store_true", help="só mostra os sais atuais")
+    args = parser.parse_args(argv)
+
+    cfg = load_yaml(args.config)
+    salts = load_salts(cfg) if args.show else invalidate(cfg, args.domain)
+    print(json.dumps(salts, indent=2, sort_keys=True))
+    return salts
+
+if __name__ == "__main__":
+    main()
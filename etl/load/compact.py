@@ -0,0 +1,142 @@
+# Junta os Parquet pequenos de cada partição de uma camada (silver/gold) em arquivos de até
+# --target-mb. A partição nova é montada ao lado e trocada com a atual num rename atômico,
+# então quem lista a pasta vê o conjunto antigo ou o novo, nunca os dois misturados.
+# Não rodar junto com o ETL do mesmo domínio.
+#
+#   python -m etl.load.compact data/silver/energy --domain energy
+#   python -m etl.load.compact data/gold/energy --domain energy --target-mb 256 --min-files 4
+import argparse
+import ctypes
+import os
+import shutil
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from etl.load.snapshots import commit_snapshot, list_snapshots
+from etl.load.to_parquet import COMPACTED, compacted_name, load_lineage, parquet_options, part_dirs, save_lineage
+from etl.utils.io import load_yaml
+
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+TRASH = ".compact_trash"        # partições substituídas, ao lado da camada (ex.: data/silver/.compact_trash)
+
+def _exchange(a: str, b: str) -> bool:
+    # renameat2(RENAME_EXCHANGE): troca as duas pastas numa operação só (Linux >= 3.15)
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    return renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0
+
+def _swap(part_dir: str, staged: str, trash: str) -> None:
+    os.makedirs(os.path.dirname(trash), exist_ok=True)
+    if _exchange(staged, part_dir):
+        os.rename(staged, trash)        # `staged` agora guarda a versão antiga
+        return
+    # sem renameat2: dois renames, com uma janela curta em que a partição não existe
+    os.rename(part_dir, trash)
+    os.rename(staged, part_dir)
+
+def _empty_trash(trash_root: str, ttl_s: float) -> None:
+    if not os.path.isdir(trash_root):
+        return
+    now = time.time()
+    for d in os.listdir(trash_root):
+        path = os.path.join(trash_root, d)
+        if now - os.path.getmtime(path) > ttl_s:
+            shutil.rmtree(path, ignore_errors=True)
+
+def plan(part_dir: str, files: list[str], target_bytes: int, min_files: int) -> list[list[str]]:
+    # agrupa os arquivos menores que o alvo, em ordem de nome, até somar target_bytes
+    small = [f for f in sorted(files) if f.endswith(".parquet")
+             and os.path.getsize(os.path.join(part_dir, f)) < target_bytes]
+    bins, cur, size = [], [], 0
+    for f in small:
+        cur.append(f)
+        size += os.path.getsize(os.path.join(part_dir, f))
+        if size >= target_bytes:
+            bins.append(cur)
+            cur, size = [], 0
+    bins.append(cur)
+    return [b for b in bins if len(b) >= min_files]
+
+def compact_partition(part_dir: str, files: list[str], target_bytes: int, min_files: int,
+                      options: dict, trash_root: str) -> int:
+    bins = plan(part_dir, files, target_bytes, min_files)
+    if not bins:
+        return 0
+    parent, name = os.path.split(os.path.abspath(part_dir))
+    staged = os.path.join(parent, f".{name}.compact")
+    shutil.rmtree(staged, ignore_errors=True)
+    os.makedirs(staged)
+
+    lineage = load_lineage(part_dir)
+    merged = {f for b in bins for f in b}
+    for b in bins:
+        pieces, members, offset = [], {}, 0
+        for f in b:
+            table = pq.ParquetFile(os.path.join(part_dir, f)).read()
+            # a linhagem guarda a faixa de linhas de cada parte, para o ETL poder substituí-la depois
+            for m, (start, rows) in (lineage.pop(f, None) or {f[:-len(".parquet")]: [0, table.num_rows]}).items():
+                members[m] = [offset + start, rows]
+            pieces.append(table)
+            offset += table.num_rows
+        out = compacted_name()
+        pq.write_table(pa.concat_tables(pieces, promote_options="permissive"), os.path.join(staged, out), **options)
+        lineage[out] = members
+    for f in files:
+        if f in merged or f == COMPACTED:
+            continue
+        try:
+            os.link(os.path.join(part_dir, f), os.path.join(staged, f))
+        except OSError:
+            shutil.copy2(os.path.join(part_dir, f), os.path.join(staged, f))
+    save_lineage(staged, lineage)
+    # camada sem partições: _stats/ e afins moram na própria pasta e acompanham a troca
+    for d in os.listdir(part_dir):
+        if d.startswith(("_", ".")) and os.path.isdir(os.path.join(part_dir, d)):
+            os.rename(os.path.join(part_dir, d), os.path.join(staged, d))
+
+    rel = os.path.relpath(os.path.abspath(part_dir), os.path.dirname(trash_root)).replace(os.sep, "__")
+    _swap(part_dir, staged, os.path.join(trash_root, f"{time.strftime('%Y%m%dT%H%M%S')}-{rel}"))
+    return len(merged)
+
+def compact(base_dir: str, options: dict, target_mb: float = 128, min_files: int = 2,
+            trash_hours: float = 24) -> dict[str, int]:
+    trash_root = os.path.join(os.path.dirname(os.path.abspath(base_dir)), TRASH)
+    _empty_trash(trash_root, trash_hours * 3600)
+    out = {}
+    # só pastas-folha (sem subpartições); a lista é feita antes de qualquer troca
+    for part_dir, files in list(part_dirs(base_dir)):
+        if any(os.path.isdir(os.path.join(part_dir, d)) and not d.startswith(("_", "."))
+               for d in os.listdir(part_dir)):
+            continue
+        n = compact_partition(part_dir, files, int(target_mb * (1 << 20)), min_files, options, trash_root)
+        if n:
+            out[part_dir] = n
+    if out and list_snapshots(base_dir):
+        commit_snapshot(base_dir)       # leitores por snapshot passam a ver os arquivos compactados
+    return out
+
+def main(argv: list[str] | None = None) -> dict[str, int]:
+    parser = argparse.ArgumentParser(description="Compacta arquivos Parquet pequenos por partição")
+    parser.add_argument("path", help="pasta de uma camada (ex.: data/silver/energy)")
+    parser.add_argument("--config", default="configs/config.yaml")
+    parser.add_argument("--domain", help="usa parquet.<domínio> do config no arquivo compactado")
+    parser.add_argument("--target-mb", type=float, default=128)
+    parser.add_argument("--min-files", type=int, default=2)
+    parser.add_argument("--trash-hours", type=float, default=24, help="tempo que as partições antigas ficam em .compact_trash")
+    args = parser.parse_args(argv)
+
+    options = parquet_options(load_yaml(args.config), args.domain) if args.domain else {}
+    out = compact(args.path, options, args.target_mb, args.min_files, args.trash_hours)
+    for part_dir, n in sorted(out.items()):
+        print(f"{part_dir}: {n} arquivo(s) compactado(s)")
+    print(f"{len(out)} partição(ões) compactada(s)")
+    return out
+
+if __name__ == "__main__":
+    main()
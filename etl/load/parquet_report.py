@@ -0,0 +1,77 @@
+# Tamanho de arquivo e tempo de escrita de cada configuração do writer Parquet,
+# para escolher parquet.<domínio> no config.yaml a partir dos dados reais.
+#
+#   python -m etl.load.parquet_report data/silver/energy --domain energy
+#   python -m etl.load.parquet_report data/silver/energy --codecs snappy zstd:3 zstd:9 --row-groups 65536 1048576
+import argparse
+import itertools
+import os
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from etl.load.to_parquet import parquet_options
+from etl.utils.io import load_yaml
+
+def _codec(spec: str) -> dict:
+    # "zstd:3" -> compression=zstd, compression_level=3
+    name, _, level = spec.partition(":")
+    return {"compression": name, **({"compression_level": int(level)} if level else {})}
+
+def grid(codecs: list[str], row_groups: list[int], dictionary: list[bool]) -> list[dict]:
+    return [
+        {**_codec(c), "row_group_size": rg, "use_dictionary": d, "write_statistics": True}
+        for c, rg, d in itertools.product(codecs, row_groups, dictionary)
+    ]
+
+def benchmark(table: pa.Table, settings: list[dict], workdir: str) -> pd.DataFrame:
+    rows = []
+    for i, options in enumerate(settings):
+        path = os.path.join(workdir, f"bench_{i}.parquet")
+        t0 = time.perf_counter()
+        pq.write_table(table, path, **options)
+        elapsed = time.perf_counter() - t0
+        rows.append({
+            "compression": options.get("compression", "snappy"),
+            "level": options.get("compression_level"),
+            "row_group_size": options.get("row_group_size"),
+            "dictionary": str(options.get("use_dictionary", True)),
+            "statistics": str(options.get("write_statistics", True)),
+            "row_groups": pq.ParquetFile(path).metadata.num_row_groups,
+            "size_mb": round(os.path.getsize(path) / 2**20, 3),
+            "write_s": round(elapsed, 3),
+        })
+        os.remove(path)
+    return pd.DataFrame(rows)
+
+def main(argv: list[str] | None = None) -> pd.DataFrame:
+    parser = argparse.ArgumentParser(description="Compara configurações do writer Parquet (tamanho x tempo de escrita)")
+    parser.add_argument("path", help="arquivo .parquet ou pasta de uma camada (ex.: data/silver/energy)")
+    parser.add_argument("--config", default="configs/config.yaml")
+    parser.add_argument("--domain", help="inclui a configuração atual de parquet.<domínio> no relatório")
+    parser.add_argument("--codecs", nargs="+", default=["snappy", "zstd:1", "zstd:3", "zstd:9"])
+    parser.add_argument("--row-groups", nargs="+", type=int, default=[65536, 131072, 1048576])
+    parser.add_argument("--dictionary", nargs="+", type=lambda v: v.lower() == "true", default=[True, False])
+    parser.add_argument("--out", help="salva o relatório em CSV")
+    args = parser.parse_args(argv)
+
+    table = pq.read_table(args.path)
+    settings = grid(args.codecs, args.row_groups, args.dictionary)
+    if args.domain:
+        settings.insert(0, parquet_options(load_yaml(args.config), args.domain))
+    with tempfile.TemporaryDirectory() as workdir:
+        report = benchmark(table, settings, workdir)
+    if args.domain:
+        report.insert(0, "setting", ["config"] + ["grid"] * (len(report) - 1))
+
+    print(f"{args.path}: {table.num_rows} linhas, {table.num_columns} colunas")
+    print(report.sort_values("size_mb").to_string(index=False))
+    if args.out:
+        report.to_csv(args.out, index=False)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+# Reordena as tabelas fato do warehouse por warehouse.cluster_by (ex.: dt, site_code, line_code).
+# As cargas já inserem cada lote ordenado; rodar periodicamente junta os lotes numa ordem só.
+#
+#   python -m etl.load.recluster
+#   python -m etl.load.recluster --domain energy
+import argparse
+
+from etl.load.to_duckdb import TABLES, recluster
+from etl.utils.duckdb_conn import close_all, configure
+from etl.utils.io import load_yaml
+
+def main(argv: list[str] | None = None) -> list[str]:
+    parser = argparse.ArgumentParser(description="Reordena as tabelas fato do DuckDB para pruning por zone maps")
+    parser.add_argument("--config", default="configs/config.yaml")
+    parser.add_argument("--domain", nargs="+", choices=list(TABLES), default=list(TABLES))
+    args = parser.parse_args(argv)
+
+    cfg = load_yaml(args.config)
+    configure(cfg)
+    try:
+        out = [recluster(domain, cfg) for domain in args.domain]
+    finally:
+        close_all()
+    for msg in out:
+        print(msg)
+    return out
+
+if __name__ == "__main__":
+    main()
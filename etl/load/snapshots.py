@@ -0,0 +1,167 @@
+# Snapshots de uma camada (silver/gold de um domínio): cada commit grava <id>.json, imutável,
+# com os arquivos de dados daquele momento, e troca o ponteiro CURRENT. Os arquivos entram como
+# hard links em objects/ (mesmo layout Hive), que nunca são reescritos: ler um snapshot não
+# enxerga escrita pela metade nem a substituição de uma parte. Tudo fica em
+# <camada>/_snapshots/<domínio>, fora da pasta do domínio, para o glob .../<domínio>/**/*.parquet
+# não ler as cópias junto com as partes.
+#
+#   python -m etl.load.snapshots data/silver/energy                 # lista os snapshots
+#   python -m etl.load.snapshots data/silver/energy --diff 3 5      # partes novas/alteradas/removidas
+#   python -m etl.load.snapshots data/silver/energy --expire 10     # mantém só os 10 últimos
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from etl.load.to_parquet import part_dirs, remove_empty_dirs
+from etl.utils.cache import link_or_copy
+
+SNAPSHOTS = "_snapshots"
+OBJECTS = "objects"
+CURRENT = "CURRENT"
+
+def _snap_dir(base_dir: str) -> str:
+    base_dir = os.path.normpath(base_dir)
+    snap_dir = os.path.join(os.path.dirname(base_dir), SNAPSHOTS, os.path.basename(base_dir))
+    legacy = os.path.join(base_dir, SNAPSHOTS)
+    if os.path.isdir(legacy) and not os.path.exists(snap_dir):
+        # snapshots gravados dentro da pasta do domínio (versão anterior): muda para fora
+        os.makedirs(os.path.dirname(snap_dir), exist_ok=True)
+        try:
+            os.rename(legacy, snap_dir)
+        except OSError:     # outro processo já migrou
+            pass
+    return snap_dir
+
+def _objects(snap_dir: str, snap: dict) -> dict[str, str]:
+    # caminho lógico -> objeto; snapshots antigos guardam _snapshots/objects/... (relativo ao domínio)
+    prefix = SNAPSHOTS + os.sep
+    return {rel: os.path.join(snap_dir, obj[len(prefix):] if obj.startswith(prefix) else obj)
+            for rel, obj in snap.get("files", {}).items()}
+
+def _file_id(path: str) -> str:
+    # toda escrita cria um inode novo (remove + grava ou rename), então inode+tamanho+mtime identificam a versão
+    st = os.stat(path)
+    return hashlib.sha1(f"{st.st_ino}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:12]
+
+def list_snapshots(base_dir: str) -> list[int]:
+    snap_dir = _snap_dir(base_dir)
+    if not os.path.isdir(snap_dir):
+        return []
+    return sorted(int(f[:-len(".json")]) for f in os.listdir(snap_dir) if f.endswith(".json") and f[:-5].isdigit())
+
+def current_snapshot(base_dir: str) -> int | None:
+    path = os.path.join(_snap_dir(base_dir), CURRENT)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return int(f.read().strip())
+
+def load_snapshot(base_dir: str, snapshot_id: int | None = None) -> dict:
+    snapshot_id = current_snapshot(base_dir) if snapshot_id is None else snapshot_id
+    if snapshot_id is None:
+        return {}
+    with open(os.path.join(_snap_dir(base_dir), f"{snapshot_id}.json")) as f:
+        return json.load(f)
+
+def snapshot_as_of(base_dir: str, as_of: str) -> int | None:
+    # último snapshot gravado até `as_of` (ISO, ex.: 2025-10-01T08:00:00)
+    ids = [i for i in list_snapshots(base_dir) if load_snapshot(base_dir, i)["committed_at"] <= as_of]
+    return ids[-1] if ids else None
+
+def snapshot_files(base_dir: str, snapshot_id: int | None = None) -> list[str]:
+    # arquivos de um snapshot (o atual por padrão), para read_parquet([...], hive_partitioning=true)
+    objects = _objects(_snap_dir(base_dir), load_snapshot(base_dir, snapshot_id))
+    return [objects[rel] for rel in sorted(objects)]
+
+def commit_snapshot(base_dir: str) -> int | None:
+    # registra o estado atual da camada; sem mudança desde o último snapshot não cria outro
+    if not os.path.isdir(base_dir):
+        return None
+    snap_dir = _snap_dir(base_dir)
+    files = {}
+    for root, names in part_dirs(base_dir):
+        for f in sorted(names):
+            if not f.endswith(".parquet"):
+                continue
+            rel = os.path.relpath(os.path.join(root, f), base_dir)
+            obj = os.path.join(OBJECTS, os.path.dirname(rel), f"{f[:-len('.parquet')]}-{_file_id(os.path.join(root, f))}.parquet")
+            path = os.path.join(snap_dir, obj)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                link_or_copy(os.path.join(root, f), path)
+            files[rel] = obj
+    parent = current_snapshot(base_dir)
+    if parent is not None and _objects(snap_dir, load_snapshot(base_dir, parent)) == _objects(snap_dir, {"files": files}):
+        return parent
+
+    os.makedirs(snap_dir, exist_ok=True)
+    snapshot_id = max(list_snapshots(base_dir), default=0) + 1
+    snap = {"id": snapshot_id, "parent": parent, "committed_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": files}
+    with open(os.path.join(snap_dir, f"{snapshot_id}.json"), "x") as f:     # "x": snapshot nunca é sobrescrito
+        json.dump(snap, f, indent=2, sort_keys=True)
+    pointer = os.path.join(snap_dir, CURRENT)
+    with open(pointer + ".tmp", "w") as f:
+        f.write(str(snapshot_id))
+    os.replace(pointer + ".tmp", pointer)       # commit atômico: leitores passam a ver o snapshot novo
+    return snapshot_id
+
+def diff_snapshots(base_dir: str, old: int, new: int | None = None) -> dict[str, list[str]]:
+    # partes (caminho lógico) que um consumidor incremental precisa reler entre dois snapshots
+    snap_dir = _snap_dir(base_dir)
+    a = _objects(snap_dir, load_snapshot(base_dir, old))
+    b = _objects(snap_dir, load_snapshot(base_dir, new))
+    return {
+        "added": sorted(b.keys() - a.keys()),
+        "changed": sorted(k for k in a.keys() & b.keys() if a[k] != b[k]),
+        "removed": sorted(a.keys() - b.keys()),
+    }
+
+def expire_snapshots(base_dir: str, keep: int) -> list[int]:
+    # apaga os snapshots mais antigos (nunca o atual) e os objetos que só eles usavam
+    ids = list_snapshots(base_dir)
+    current = current_snapshot(base_dir)
+    expired = [i for i in ids[:max(len(ids) - keep, 0)] if i != current]
+    snap_dir = _snap_dir(base_dir)
+    for i in expired:
+        os.remove(os.path.join(snap_dir, f"{i}.json"))
+    live = {obj for i in list_snapshots(base_dir) for obj in _objects(snap_dir, load_snapshot(base_dir, i)).values()}
+    objects_dir = os.path.join(snap_dir, OBJECTS)
+    for root, _, names in os.walk(objects_dir):
+        for f in names:
+            path = os.path.join(root, f)
+            if path not in live:
+                os.remove(path)
+    if os.path.isdir(objects_dir):
+        remove_empty_dirs(objects_dir)
+    return expired
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Snapshots (time travel) de uma camada Parquet")
+    parser.add_argument("path", help="pasta da camada (ex.: data/silver/energy)")
+    parser.add_argument("--commit", action="store_true", help="registra o estado atual como snapshot")
+    parser.add_argument("--files", type=int, nargs="?", const=-1, metavar="ID", help="arquivos do snapshot (padrão: atual)")
+    parser.add_argument("--diff", type=int, nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--expire", type=int, metavar="KEEP", help="mantém só os KEEP snapshots mais recentes")
+    args = parser.parse_args(argv)
+
+    if args.commit:
+        print(f"snapshot atual: {commit_snapshot(args.path)}")
+    if args.files is not None:
+        print("\n".join(snapshot_files(args.path, None if args.files == -1 else args.files)))
+    elif args.diff:
+        for kind, parts in diff_snapshots(args.path, *args.diff).items():
+            print(f"{kind}: {len(parts)}")
+            for p in parts:
+                print(f"  {p}")
+    elif args.expire is not None:
+        print(f"snapshots expirados: {expire_snapshots(args.path, args.expire)}")
+    elif not args.commit:
+        current = current_snapshot(args.path)
+        for i in list_snapshots(args.path):
+            snap = load_snapshot(args.path, i)
+            print(f"{'*' if i == current else ' '} {i:>4}  {snap['committed_at']}  {len(snap['files'])} arquivo(s)")
+
+if __name__ == "__main__":
+    main()
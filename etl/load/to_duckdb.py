@@ -1,12 +1,137 @@
-import duckdb
-
-def upsert_duckdb(domain: str, silver_path: str, cfg: dict):
-    con = duckdb.connect(cfg.get("duckdb_path", "warehouse.duckdb"))
-    table = {
-        "energy": "fact_energy",
-        "manufacturing": "fact_production",
-        "costs": "fact_costs"
-    }[domain]
-    con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM read_parquet('{silver_path}') LIMIT 0;")
-    con.execute(f"INSERT INTO {table} SELECT * FROM read_parquet('{silver_path}');")
-    return f"Inserted into {table}"
\ No newline at end of file
+import pandas as pd
+import pyarrow as pa
+from etl.load.to_parquet import DERIVED
+from etl.utils.duckdb_conn import cursor, write_lock
+from etl.utils.metrics import file_bytes, measured, parquet_rows, record
+
+TABLES = {
+    "energy": "fact_energy",
+    "manufacturing": "fact_production",
+    "costs": "fact_costs",
+}
+
+def _key_match(keys: list[str], left: str, right: str) -> str:
+    # IS NOT DISTINCT FROM: chaves nulas também casam (senão duplicariam a cada run)
+    return " AND ".join(f'{left}."{k}" IS NOT DISTINCT FROM {right}."{k}"' for k in keys)
+
+def _order_by(cfg: dict, domain: str) -> str:
+    # warehouse.cluster_by: grava em ordem de (dt, site, linha) para os zone maps min/max pularem row groups
+    cols = ((cfg.get("warehouse") or {}).get("cluster_by") or {}).get(domain)
+    return " ORDER BY " + ", ".join(f'"{c}"' for c in cols) if cols else ""
+
+# parte da Silver (nome do arquivo de origem) de cada linha: reprocessar ou remover uma fonte
+# troca/apaga exatamente as linhas dela
+PART = "_part"
+
+def _arrow(df: pd.DataFrame | pa.Table, part: str | None = None) -> pa.Table:
+    # categorias viram o tipo dos valores: senão o CREATE TABLE criaria colunas ENUM
+    tbl = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(tbl.schema):
+        if pa.types.is_dictionary(field.type):
+            tbl = tbl.set_column(i, field.name, tbl.column(i).cast(field.type.value_type))
+    return tag_part(tbl, part) if part is not None else tbl
+
+def tag_part(tbl: pa.Table, part: str) -> pa.Table:
+    return tbl.append_column(PART, pa.array([part] * len(tbl), type=pa.string()))
+
+def _load(con, domain: str, src: str, cfg: dict) -> str:
+    with write_lock(cfg.get("duckdb_path", "warehouse.duckdb")):
+        return _upsert(con, domain, src, cfg)
+
+def _upsert(con, domain: str, src: str, cfg: dict) -> str:
+    table = TABLES[domain]
+    order = _order_by(cfg, domain)
+    con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS {src} LIMIT 0;")
+    con.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {PART} VARCHAR;")     # tabelas de antes da coluna
+
+    # a versão nova de uma parte substitui todas as linhas dela (inclusive as que sumiram do arquivo);
+    # com chave natural, a mesma chave vinda de outra parte também é substituída
+    keys = (cfg.get("warehouse", {}).get("keys") or {}).get(domain)
+    partition = ", ".join(f'"{k}"' for k in keys or [])
+    # mesma chave em duas partes do lote: fica a da parte mais recente (nome maior: energy_202509 > _202504)
+    dedupe = f" QUALIFY row_number() OVER (PARTITION BY {partition} ORDER BY {PART} DESC) = 1" if keys else ""
+    con.begin()
+    try:
+        con.execute(f"CREATE OR REPLACE TEMP TABLE _stage AS {src}{dedupe};")
+        deleted = con.execute(f"DELETE FROM {table} WHERE {PART} IN (SELECT DISTINCT {PART} FROM _stage);").fetchone()[0]
+        if keys:
+            # delete-then-insert só das chaves presentes nas partes novas: o custo acompanha o
+            # volume novo e não o histórico; o intervalo da primeira chave (tempo) deixa o DuckDB
+            # pular row groups pelos zone maps
+            first = f'"{keys[0]}"'
+            deleted += con.execute(f"""
+                DELETE FROM {table} t USING _stage s
+                WHERE (t.{first} BETWEEN (SELECT min({first}) FROM _stage) AND (SELECT max({first}) FROM _stage)
+                       OR t.{first} IS NULL)
+                  AND {_key_match(keys, "t", "s")};
+            """).fetchone()[0]
+        inserted = con.execute(f"INSERT INTO {table} BY NAME SELECT * FROM _stage{order};").fetchone()[0]
+        con.execute("DROP TABLE _stage;")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    record(rows_out=inserted)
+    return f"Upserted {table}: {inserted} row(s) written, {deleted} replaced"
+
+@measured("upsert_duckdb")
+def upsert_duckdb(domain: str, silver_paths: list[str], cfg: dict):
+    if not silver_paths:
+        return f"{TABLES[domain]}: nenhuma parte nova"
+    record(rows_in=parquet_rows(silver_paths), bytes_read=file_bytes(silver_paths))
+    con = cursor(cfg.get("duckdb_path", "warehouse.duckdb"))
+    files = "[" + ", ".join(f"'{p}'" for p in silver_paths) + "]"
+    # colunas de partição voltam pelo caminho (hive); as derivadas de `dt` não vão para a tabela
+    derived = [c for c in cfg["sources"][domain].get("partition_by") or [] if c in DERIVED]
+    exclude = ", ".join(["filename", *derived])
+    part = r"regexp_extract(filename, '([^/\\]+)\.parquet$', 1)"
+    return _load(con, domain, f"SELECT * EXCLUDE ({exclude}), {part} AS {PART} "
+                              f"FROM read_parquet({files}, hive_partitioning=true, filename=true)", cfg)
+
+@measured("upsert_frame")
+def upsert_frame(domain: str, df: pd.DataFrame | pa.Table, cfg: dict, part: str | None = None):
+    # hand-off direto da Silver em memória: o DuckDB lê os buffers Arrow, sem Parquet no meio;
+    # `part` marca as linhas com a parte de origem (ou a tabela já traz a coluna _part)
+    if len(df) == 0:
+        return f"{TABLES[domain]}: nenhuma linha nova"
+    record(rows_in=len(df))
+    con = cursor(cfg.get("duckdb_path", "warehouse.duckdb"))
+    con.register("_silver", _arrow(df, part))
+    try:
+        return _load(con, domain, "SELECT * FROM _silver", cfg)
+    finally:
+        con.unregister("_silver")
+
+def prune_warehouse(domain: str, cfg: dict, keep: set[str]) -> int:
+    # partes que saíram da Silver (fonte removida, prune_parts) saem também da tabela fato
+    table = TABLES[domain]
+    path = cfg.get("duckdb_path", "warehouse.duckdb")
+    con = cursor(path)
+    if not con.execute("SELECT count(*) FROM duckdb_columns() WHERE table_name = ? AND column_name = ?",
+                       [table, PART]).fetchone()[0]:
+        return 0
+    with write_lock(path):
+        con.register("_keep", pa.table({PART: pa.array(sorted(keep), type=pa.string())}))
+        try:
+            return con.execute(f"DELETE FROM {table} WHERE {PART} NOT IN (SELECT {PART} FROM _keep);").fetchone()[0]
+        finally:
+            con.unregister("_keep")
+
+def recluster(domain: str, cfg: dict) -> str:
+    # regrava a tabela inteira na ordem de cluster_by: cargas incrementais só ordenam cada lote
+    table = TABLES[domain]
+    order = _order_by(cfg, domain)
+    con = cursor(cfg.get("duckdb_path", "warehouse.duckdb"))
+    if not order or not con.execute("SELECT count(*) FROM duckdb_tables() WHERE table_name = ?", [table]).fetchone()[0]:
+        return f"{table}: nada a reordenar"
+    with write_lock(cfg.get("duckdb_path", "warehouse.duckdb")):
+        con.begin()
+        try:
+            con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {table}{order};")
+            con.commit()
+        except Exception:
+            con.rollback()
+            raise
+        con.execute("CHECKPOINT;")      # devolve ao arquivo os blocos da versão antiga
+    rows = con.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+    return f"Reclustered {table}: {rows} row(s) by{order.removeprefix(' ORDER BY')}"
@@ -1,8 +1,231 @@
+import glob
+import json
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# mesmo marcador que o DuckDB usa para partições nulas
+HIVE_NULL = "__HIVE_DEFAULT_PARTITION__"
+
+# colunas de partição derivadas de `dt` quando não existem no DataFrame
+DERIVED = {"year": "%Y", "month": "%m", "day": "%d"}
+
+# partições gravadas em paralelo (o pyarrow solta o GIL ao codificar/comprimir)
+WRITE_WORKERS = min(8, os.cpu_count() or 1)
+
+# linhagem da compactação, por pasta de partição: {arquivo compactado: {parte: [offset, linhas]}}
+COMPACTED = "_compacted.json"
+
+def parquet_options(cfg: dict, domain: str) -> dict:
+    # opções do writer (kwargs do pyarrow): parquet.default sobrescrito por parquet.<domínio>
+    section = cfg.get("parquet") or {}
+    return {**(section.get("default") or {}), **(section.get(domain) or {})}
+
+def _hive_value(v) -> str:
+    return HIVE_NULL if pd.isna(v) else str(v)
+
+def partition_keys(df: pd.DataFrame, partition_cols: list[str]) -> pd.DataFrame:
+    keys = pd.DataFrame(index=df.index)
+    for col in partition_cols:
+        if col in df.columns:
+            keys[col] = df[col].astype("object")
+        elif col in DERIVED:
+            keys[col] = df["dt"].dt.strftime(DERIVED[col])      # ex.: year=2025/month=04
+        else:
+            raise KeyError(f"Coluna de partição '{col}' não existe no DataFrame")
+    return keys
+
+def remove_empty_dirs(base_dir: str) -> None:
+    for root, dirs, files in os.walk(base_dir, topdown=False):
+        if root != base_dir and not os.listdir(root):
+            os.rmdir(root)
+
+def load_lineage(part_dir: str) -> dict:
+    path = os.path.join(part_dir, COMPACTED)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_lineage(part_dir: str, lineage: dict) -> None:
+    path = os.path.join(part_dir, COMPACTED)
+    if not lineage:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(lineage, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def compacted_name() -> str:
+    # nome novo a cada escrita: a Gold pode ter hard link para a versão anterior
+    return f"compacted-{uuid.uuid4().hex[:12]}.parquet"
+
+def _drop_members(part_dir: str, drop: set[str]) -> None:
+    # tira as linhas das partes em `drop` dos arquivos compactados, pelas faixas de linhas da linhagem
+    lineage = load_lineage(part_dir)
+    for fname, members in list(lineage.items()):
+        if not drop & members.keys():
+            continue
+        path = os.path.join(part_dir, fname)
+        keep = {m: r for m, r in members.items() if m not in drop}
+        del lineage[fname]
+        if keep:
+            src = pq.ParquetFile(path)
+            table = src.read()
+            pieces, out, offset = [], {}, 0
+            for m, (start, rows) in sorted(keep.items(), key=lambda kv: kv[1][0]):
+                pieces.append(table.slice(start, rows))
+                out[m] = [offset, rows]
+                offset += rows
+            new = compacted_name()
+            codec = src.metadata.row_group(0).column(0).compression.lower() if src.metadata.num_row_groups else "zstd"
+            tmp = os.path.join(part_dir, new + ".tmp")
+            pq.write_table(pa.concat_tables(pieces), tmp, compression=codec)
+            os.replace(tmp, os.path.join(part_dir, new))
+            lineage[new] = out
+        save_lineage(part_dir, lineage)
+        os.remove(path)
+
+def tmp_path(out_path: str) -> str:
+    # temporário oculto na mesma pasta: fora do glob *.parquet e dos datasets do pyarrow
+    return os.path.join(os.path.dirname(out_path), f".{os.path.basename(out_path)}.{uuid.uuid4().hex[:8]}.tmp")
 
-def write_parquet_partitions(df: pd.DataFrame, base_dir: str, filename: str = "data.parquet") -> str:
+def write_table_atomic(table: pa.Table, out_path: str, options: dict | None = None) -> str:
+    # grava no temporário e renomeia: um crash nunca deixa um .parquet truncado no lugar do bom
+    tmp = tmp_path(out_path)
+    try:
+        pq.write_table(table, tmp, **(options or {}))
+        os.replace(tmp, out_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return out_path
+
+def remove_part(base_dir: str, filename: str, keep: Iterable[str] = ()) -> None:
+    # apaga a parte em todas as partições (menos `keep`), inclusive as linhas dela dentro de arquivos compactados
+    keep = {os.path.abspath(p) for p in keep}
+    for path in glob.glob(os.path.join(glob.escape(base_dir), "**", filename), recursive=True):
+        if os.path.abspath(path) not in keep:
+            os.remove(path)
+    # temporários de uma escrita interrompida
+    for path in glob.glob(os.path.join(glob.escape(base_dir), "**", f".{glob.escape(filename)}.*.tmp"), recursive=True):
+        os.remove(path)
+    stem = filename[:-len(".parquet")]
+    for sidecar in glob.glob(os.path.join(glob.escape(base_dir), "**", COMPACTED), recursive=True):
+        _drop_members(os.path.dirname(sidecar), {stem})
+    remove_empty_dirs(base_dir)
+
+def write_parquet_partitions(df: pd.DataFrame, base_dir: str, filename: str = "data.parquet",
+                             partition_cols: list[str] | None = None, options: dict | None = None,
+                             workers: int = WRITE_WORKERS) -> list[str]:
+    os.makedirs(base_dir, exist_ok=True)
+    if not partition_cols:
+        out = [write_table_atomic(pa.Table.from_pandas(df, preserve_index=False), os.path.join(base_dir, filename), options)]
+        remove_part(base_dir, filename, keep=out)
+        return out
+
+    # layout Hive: <base>/site_code=SC01/year=2025/month=04/<filename>
+    df = df.reset_index(drop=True)      # rótulos = posições na tabela Arrow
+    keys = partition_keys(df, partition_cols)
+    table = pa.Table.from_pandas(df.drop(columns=[c for c in partition_cols if c in df.columns]), preserve_index=False)
+    jobs = []
+    for values, idx in keys.groupby(list(keys.columns), dropna=False, sort=True).groups.items():
+        values = values if isinstance(values, tuple) else (values,)
+        part_dir = os.path.join(base_dir, *[f"{c}={_hive_value(v)}" for c, v in zip(partition_cols, values)])
+        os.makedirs(part_dir, exist_ok=True)
+        jobs.append((table.take(pa.array(idx.to_numpy(), type=pa.int64())), os.path.join(part_dir, filename)))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        out = list(ex.map(lambda job: write_table_atomic(job[0], job[1], options), jobs))
+    # só depois de tudo gravado: a nova versão pode não cair nas mesmas partições
+    remove_part(base_dir, filename, keep=out)
+    return out
+
+def write_parquet_stream(batches: Iterable[pa.RecordBatch], base_dir: str, filename: str = "data.parquet",
+                         options: dict | None = None) -> str:
     os.makedirs(base_dir, exist_ok=True)
     out_path = os.path.join(base_dir, filename)
-    df.to_parquet(out_path, index=False)   # requer pyarrow ou fastparquet
+    tmp = tmp_path(out_path)
+    options = dict(options or {})
+    row_group_size = options.pop("row_group_size", None)
+    writer, buf, buffered = None, [], 0
+
+    def flush():
+        # chunks pequenos são acumulados até o row group alvo (memória limitada a row_group_size linhas)
+        writer.write_table(pa.concat_tables(buf), row_group_size=row_group_size)
+        buf.clear()
+
+    ok = False
+    try:
+        for batch in batches:
+            tbl = pa.Table.from_batches([batch])
+            if writer is None:
+                # o primeiro chunk define o schema do arquivo
+                writer = pq.ParquetWriter(tmp, tbl.schema, **options)
+            elif tbl.schema != writer.schema:
+                try:
+                    tbl = tbl.select(writer.schema.names).cast(writer.schema)
+                except (pa.ArrowNotImplementedError, KeyError) as e:
+                    # chunk incompatível com o primeiro (ex.: coluna toda nula no primeiro chunk):
+                    # mesmo erro de tipo do parser, para cair no fallback de quem chamou
+                    raise pa.ArrowInvalid(str(e)) from e
+            buf.append(tbl)
+            buffered += tbl.num_rows
+            if row_group_size is None or buffered >= row_group_size:
+                flush()
+                buffered = 0
+        if buf:
+            flush()
+        ok = True
+    finally:
+        if writer is not None:
+            writer.close()
+        if not ok and os.path.exists(tmp):
+            os.remove(tmp)
+    if writer is None:
+        # nenhum arquivo de origem: mesmo resultado do caminho em DataFrame
+        return write_table_atomic(pa.Table.from_pandas(pd.DataFrame()), out_path)
+    os.replace(tmp, out_path)
     return out_path
+
+def part_dirs(base_dir: str):
+    # pastas da camada, em qualquer partição (ignora _cas/ e temporários)
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(("_", "."))]
+        yield root, files
+
+def _part_files(base_dir: str) -> list[str]:
+    # .parquet de uma parte só; arquivos compactados entram pelas partes da linhagem
+    out = []
+    for root, files in part_dirs(base_dir):
+        compacted = load_lineage(root) if COMPACTED in files else {}
+        out += [os.path.join(root, f) for f in files if f.endswith(".parquet") and f not in compacted]
+    return out
+
+def _compacted_members(base_dir: str) -> dict[str, set[str]]:
+    return {root: set().union(*load_lineage(root).values()) for root, files in part_dirs(base_dir)
+            if COMPACTED in files}
+
+def list_parts(base_dir: str) -> set[str]:
+    stems = {os.path.basename(f)[:-len(".parquet")] for f in _part_files(base_dir)}
+    return stems.union(*_compacted_members(base_dir).values())
+
+def prune_parts(base_dir: str, keep: set[str]) -> list[str]:
+    # remove partes cuja origem não existe mais na camada anterior
+    removed = []
+    for path in _part_files(base_dir):
+        if os.path.basename(path)[:-len(".parquet")] not in keep:
+            os.remove(path)
+            removed.append(path)
+    for part_dir, members in _compacted_members(base_dir).items():
+        if members - set(keep):
+            _drop_members(part_dir, members - set(keep))
+            removed += [os.path.join(part_dir, f"{m}.parquet") for m in sorted(members - set(keep))]
+    remove_empty_dirs(base_dir)
+    return removed
@@ -1,14 +1,5 @@
-try:
-    from great_expectations.dataset import PandasDataset
-except Exception:
-    PandasDataset = None
+from etl.quality.rules import run_rules
 
-def run_gx_suite(domain: str, df):
-    if PandasDataset is None:
-        return True
-    ds = PandasDataset(df)
-    if domain == "energy" and "kwh" in df.columns:
-        ds.expect_column_values_to_not_be_null("kwh")
-        ds.expect_column_values_to_be_between("kwh", min_value=0)
-    res = ds.validate()
-    return res.success
\ No newline at end of file
+def run_gx_suite(domain: str, df, cfg: dict | None = None):
+    # mantido por compatibilidade: as regras agora são as nativas de etl.quality.rules
+    return run_rules(domain, df, cfg or {})["success"]
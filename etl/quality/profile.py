@@ -0,0 +1,137 @@
+# Estatísticas por coluna (linhas, nulos, min/max, negativos e distintos estimados por KMV)
+# calculadas sobre o DataFrame que a Silver já tem em memória (engine duckdb: agregações SQL
+# sobre as partes gravadas, sem trazê-las para o Python). Os perfis de cada parte são
+# combináveis: _stats/<parte>.json por parte e _profile.json com o domínio inteiro, ao lado da
+# Silver, para as regras de estrutura/frescor não precisarem reler os Parquet.
+import glob
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from etl.utils.duckdb_conn import cursor
+
+STATS_DIR = "_stats"
+PROFILE = "_profile.json"
+KMV_K = 1024        # menores hashes guardados por coluna: erro relativo ~ 1/sqrt(K) (~3%)
+
+def _scalar(v):
+    if v is None or (not isinstance(v, str) and pd.isna(v)):
+        return None
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, np.generic):
+        return v.item()
+    return v if isinstance(v, (int, float, str, bool)) else str(v)
+
+def _kmv(s: pd.Series) -> list[int]:
+    hashes = np.unique(pd.util.hash_pandas_object(s.dropna(), index=False).to_numpy())
+    return hashes[:KMV_K].tolist()      # np.unique já devolve ordenado
+
+def distinct_estimate(kmv: list[int]) -> int:
+    if len(kmv) < KMV_K:
+        return len(kmv)                 # poucos valores: o sketch é exato
+    return int((KMV_K - 1) / (kmv[-1] / 2**64))
+
+def profile_frame(df: pd.DataFrame) -> dict:
+    rows = len(df)
+    nulls = df.isna().sum()             # todas as colunas numa passada
+    cols = {}
+    for c in df.columns:
+        s = df[c]
+        numeric = pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+        try:
+            lo, hi = (s.min(), s.max()) if rows else (None, None)
+        except TypeError:               # categorias não ordenadas / tipos misturados
+            lo, hi = (s.astype("string").min(), s.astype("string").max())
+        cols[str(c)] = {
+            "type": str(s.dtype),
+            "nulls": int(nulls[c]),
+            "min": _scalar(lo),
+            "max": _scalar(hi),
+            "negatives": int((s < 0).sum()) if numeric else None,
+            "kmv": _kmv(s),
+        }
+    return {"rows": rows, "columns": cols}
+
+def _numeric(sql_type: str) -> bool:
+    return sql_type.split("(")[0] in ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT",
+                                      "UINTEGER", "UBIGINT", "UHUGEINT", "FLOAT", "DOUBLE", "DECIMAL")
+
+def profile_sql(relation: str) -> dict:
+    # mesmo perfil de profile_frame, calculado no DuckDB sobre `relation` (subconsulta SQL)
+    con = cursor()
+    types = {r[0]: r[1] for r in con.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()}
+    aggs = ["count(*)"]
+    for c, t in types.items():
+        aggs += [f'count(*) - count("{c}")', f'min("{c}")', f'max("{c}")',
+                 f'count(*) FILTER (WHERE "{c}" < 0)' if _numeric(t) else "NULL"]
+    row = con.execute(f"SELECT {', '.join(aggs)} FROM {relation}").fetchone()
+    cols = {}
+    for i, (c, t) in enumerate(types.items()):
+        nulls, lo, hi, negatives = row[1 + 4 * i: 5 + 4 * i]
+        # KMV: os K menores hashes distintos, já ordenados
+        kmv = con.execute(f'SELECT DISTINCT hash("{c}") AS h FROM {relation} WHERE "{c}" IS NOT NULL '
+                          f"ORDER BY h LIMIT {KMV_K}").fetchall()
+        cols[c] = {"type": t, "nulls": int(nulls), "min": _scalar(lo), "max": _scalar(hi),
+                   "negatives": None if negatives is None else int(negatives), "kmv": [h for h, in kmv]}
+    return {"rows": int(row[0]), "columns": cols}
+
+def merge_profiles(profiles: list[dict]) -> dict:
+    out = {"rows": 0, "columns": {}}
+    for p in profiles:
+        out["rows"] += p["rows"]
+        for c, st in p["columns"].items():
+            cur = out["columns"].get(c)
+            if cur is None:
+                out["columns"][c] = {**st, "nulls": st["nulls"] + (out["rows"] - p["rows"])}   # ausente nas partes anteriores
+                continue
+            cur["nulls"] += st["nulls"]
+            for k, pick in (("min", min), ("max", max)):
+                vals = [v for v in (cur[k], st[k]) if v is not None]
+                try:
+                    cur[k] = pick(vals) if vals else None
+                except TypeError:
+                    cur[k] = pick(str(v) for v in vals)
+            if st["negatives"] is not None:
+                cur["negatives"] = (cur["negatives"] or 0) + st["negatives"]
+            cur["kmv"] = sorted(set(cur["kmv"]) | set(st["kmv"]))[:KMV_K]
+        for c in out["columns"].keys() - p["columns"].keys():
+            out["columns"][c]["nulls"] += p["rows"]
+    return out
+
+def _dump(obj: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(obj, f)
+    os.replace(path + ".tmp", path)
+
+def save_part_profile(silver_dir: str, stem: str, profile: dict) -> None:
+    _dump(profile, os.path.join(silver_dir, STATS_DIR, f"{stem}.json"))
+
+def refresh_profile(silver_dir: str, keep: set[str]) -> dict:
+    # descarta perfis de partes que saíram da camada e recombina o domínio (só JSON, sem ler Parquet)
+    parts = []
+    for path in sorted(glob.glob(os.path.join(glob.escape(silver_dir), STATS_DIR, "*.json"))):
+        if os.path.basename(path)[:-len(".json")] not in keep:
+            os.remove(path)
+            continue
+        with open(path) as f:
+            parts.append(json.load(f))
+    merged = merge_profiles(parts)
+    for st in merged["columns"].values():
+        st["distinct"] = distinct_estimate(st["kmv"])
+    _dump(merged, os.path.join(silver_dir, PROFILE))
+    return merged
+
+def load_profile(silver_dir: str) -> dict | None:
+    path = os.path.join(silver_dir, PROFILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,162 @@
+# Regras de qualidade nativas (sem Great Expectations), lidas de quality.* no config:
+# not_null (padrão: required_cols), range, unique (padrão: warehouse.keys) e references
+# (valores que precisam existir na Silver de outro domínio). Cada coluna é avaliada uma vez,
+# com operações vetorizadas (engine duckdb: consultas no próprio DuckDB), e o resultado é um
+# dict por regra.
+import os
+
+import numpy as np
+import pandas as pd
+
+from etl.load.snapshots import list_snapshots, snapshot_files
+from etl.utils.duckdb_conn import cursor
+
+def domain_rules(domain: str, cfg: dict) -> dict:
+    quality = cfg.get("quality") or {}
+    rules = dict((quality.get("rules") or {}).get(domain) or {})
+    rules.setdefault("not_null", (quality.get("required_cols") or {}).get(domain) or [])
+    keys = ((cfg.get("warehouse") or {}).get("keys") or {}).get(domain)
+    rules.setdefault("unique", [keys] if keys else [])
+    rules.setdefault("min_rows", quality.get("expect_min_rows", 0))
+    return rules
+
+def _silver_source(cfg: dict, domain: str) -> str | None:
+    base = os.path.join(cfg["silver"], domain)
+    if list_snapshots(base):
+        files = snapshot_files(base)
+    else:
+        files = [os.path.join(base, "**", "*.parquet")] if os.path.isdir(base) else []
+    return "[" + ", ".join(f"'{f}'" for f in files) + "]" if files else None
+
+def reference_values(cfg: dict, domain: str, columns: list[str]) -> pd.DataFrame | None:
+    # chaves distintas já publicadas na Silver do domínio de referência (None se ainda não existe)
+    src = _silver_source(cfg, domain)
+    if src is None:
+        return None
+    cols = ", ".join(f'"{c}"' for c in columns)
+    return cursor().execute(f"SELECT DISTINCT {cols} FROM read_parquet({src}, hive_partitioning=true)").df()
+
+def _check(rule: str, columns: list[str], failed: int, rows: int, **extra) -> dict:
+    return {"rule": rule, "columns": columns, "failed": int(failed), "rows": rows, "success": failed == 0, **extra}
+
+# contagens de cada regra sobre um DataFrame ou, na engine duckdb, sobre uma relação SQL (str)
+def _scalar_sql(sql: str) -> int:
+    return int(cursor().execute(sql).fetchone()[0] or 0)
+
+def _columns(data) -> list[str]:
+    if isinstance(data, str):
+        return [r[0] for r in cursor().execute(f"DESCRIBE SELECT * FROM {data}").fetchall()]
+    return list(data.columns)
+
+def _nulls(data, cols: list[str]) -> dict:
+    if not cols:
+        return {}
+    if isinstance(data, str):
+        counts = ", ".join(f'count(*) - count("{c}")' for c in cols)
+        row = cursor().execute(f"SELECT {counts} FROM {data}").fetchone()
+        return dict(zip(cols, row))
+    return data[cols].isna().sum().to_dict()
+
+def _out_of_range(data, c: str, bounds: dict) -> int:
+    if isinstance(data, str):
+        value = f'TRY_CAST("{c}" AS DOUBLE)'
+        cond = [f"{value} {op} {bounds[k]}" for k, op in (("min", "<"), ("max", ">")) if bounds.get(k) is not None]
+        return _scalar_sql(f"SELECT count(*) FROM {data} WHERE {' OR '.join(cond)}") if cond else 0
+    values = pd.to_numeric(data[c], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    bad = np.zeros(len(values), dtype=bool)
+    if bounds.get("min") is not None:
+        bad |= values < bounds["min"]
+    if bounds.get("max") is not None:
+        bad |= values > bounds["max"]
+    return int(bad.sum())
+
+def _duplicates(data, cols: list[str]) -> int:
+    if isinstance(data, str):
+        # DISTINCT trata nulos como iguais, como o duplicated() do pandas
+        quoted = ", ".join(f'"{c}"' for c in cols)
+        return _scalar_sql(f"SELECT count(*) - (SELECT count(*) FROM (SELECT DISTINCT {quoted} FROM {data})) FROM {data}")
+    return int(data.duplicated(subset=cols).sum())
+
+def _unknown_refs(data, cfg: dict, domain: str, cols: list[str]) -> int | None:
+    # linhas (sem nulos nas colunas) cujas chaves não existem na Silver de `domain`; None se ela não existe
+    if isinstance(data, str):
+        src = _silver_source(cfg, domain)
+        if src is None:
+            return None
+        match = " AND ".join(f'CAST(r."{c}" AS VARCHAR) = CAST(s."{c}" AS VARCHAR)' for c in cols)
+        filled = " AND ".join(f's."{c}" IS NOT NULL' for c in cols)
+        return _scalar_sql(f"SELECT count(*) FROM {data} s WHERE {filled} AND NOT EXISTS "
+                           f"(SELECT 1 FROM read_parquet({src}, hive_partitioning=true) r WHERE {match})")
+    known = reference_values(cfg, domain, cols)
+    if known is None:
+        return None
+    keys = pd.MultiIndex.from_frame(data[cols].astype("string"))
+    bad = ~keys.isin(pd.MultiIndex.from_frame(known[cols].astype("string"))) & data[cols].notna().all(axis=1).to_numpy()
+    return int(bad.sum())
+
+def run_rules(domain: str, df: pd.DataFrame | str, cfg: dict, profile: dict | None = None) -> dict:
+    # df: DataFrame da parte ou, na engine duckdb, a relação SQL das partes gravadas (avaliada no DuckDB)
+    # com o perfil da parte (etl.quality.profile) linhas, nulos e min/max não são recalculados
+    rules = domain_rules(domain, cfg)
+    stats = (profile or {}).get("columns", {})
+    columns = _columns(df)
+    if profile is not None:
+        rows = profile["rows"]
+    else:
+        rows = _scalar_sql(f"SELECT count(*) FROM {df}") if isinstance(df, str) else len(df)
+    checks = [_check("min_rows", [], int(rows < rules["min_rows"]), rows, expected=rules["min_rows"])]
+
+    # not_null: todas as colunas numa passada só
+    required = list(rules["not_null"])
+    missing = [c for c in required if c not in columns]
+    present = [c for c in required if c in columns]
+    if all(c in stats for c in present):
+        nulls = {c: stats[c]["nulls"] for c in present}
+    else:
+        nulls = _nulls(df, present)
+    for c in missing:
+        checks.append(_check("not_null", [c], rows, rows, error="coluna ausente"))
+    for c in present:
+        checks.append(_check("not_null", [c], nulls[c], rows))
+
+    # range: nulos não contam aqui (já são do not_null)
+    for c, bounds in (rules.get("range") or {}).items():
+        if c not in columns:
+            checks.append(_check("range", [c], rows, rows, error="coluna ausente"))
+            continue
+        st = stats.get(c) or {}
+        if (isinstance(st.get("min"), (int, float)) and isinstance(st.get("max"), (int, float))
+                and (bounds.get("min") is None or st["min"] >= bounds["min"])
+                and (bounds.get("max") is None or st["max"] <= bounds["max"])):
+            checks.append(_check("range", [c], 0, rows, min=bounds.get("min"), max=bounds.get("max")))
+            continue
+        checks.append(_check("range", [c], _out_of_range(df, c, bounds), rows, min=bounds.get("min"), max=bounds.get("max")))
+
+    for cols in rules.get("unique") or []:
+        cols = [cols] if isinstance(cols, str) else list(cols)
+        if any(c not in columns for c in cols):
+            checks.append(_check("unique", cols, rows, rows, error="coluna ausente"))
+            continue
+        checks.append(_check("unique", cols, _duplicates(df, cols), rows))
+
+    for ref in rules.get("references") or []:
+        cols = list(ref["columns"])
+        if any(c not in columns for c in cols):
+            checks.append(_check("references", cols, rows, rows, domain=ref["domain"], error="coluna ausente"))
+            continue
+        bad = _unknown_refs(df, cfg, ref["domain"], cols)
+        if bad is None:
+            # domínio de referência ainda sem Silver (primeira carga): não dá para afirmar nada
+            checks.append({**_check("references", cols, 0, rows, domain=ref["domain"]), "skipped": True})
+            continue
+        checks.append(_check("references", cols, bad, rows, domain=ref["domain"]))
+
+    return {"domain": domain, "rows": rows, "success": all(c["success"] for c in checks), "checks": checks}
+
+def summary(result: dict) -> str:
+    failed = [c for c in result["checks"] if not c["success"]]
+    if not failed:
+        return f"{result['domain']}: {len(result['checks'])} regra(s) OK em {result['rows']} linha(s)"
+    items = "; ".join(f"{c['rule']}({', '.join(c['columns'])})={c['failed']}" + (f" [{c['error']}]" if "error" in c else "")
+                      for c in failed)
+    return f"{result['domain']}: {len(failed)} regra(s) falharam em {result['rows']} linha(s): {items}"
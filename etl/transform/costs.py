@@ -1,9 +1,12 @@
 import pandas as pd
+import pyarrow as pa
+
+from etl.utils.io import read_bronze
 
 REQUIRED = ["ref_month","site_code","account_code","amount_br"]
 
-def transform_costs(bronze_path: str, cfg: dict) -> pd.DataFrame:
-    df = pd.read_csv(bronze_path) if bronze_path.endswith(".csv") else pd.read_parquet(bronze_path)
+def transform_costs(bronze_path: str | pa.Table, cfg: dict) -> pd.DataFrame:
+    df = read_bronze(bronze_path)
     df = df[[c for c in REQUIRED if c in df.columns] + [c for c in df.columns if c not in REQUIRED]].copy()
     df["ref_month"] = pd.to_datetime(df["ref_month"], errors="coerce")
     df["dt"] = df["ref_month"].dt.to_period("M").dt.to_timestamp()
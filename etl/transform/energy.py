@@ -1,12 +1,21 @@
 import pandas as pd
+import pyarrow as pa
 
-def transform_energy(bronze_path: str, cfg: dict) -> pd.DataFrame:
-    # lê o parquet da Bronze (ou CSV, se preferir)
-    df = pd.read_parquet(bronze_path) if bronze_path.endswith(".parquet") else pd.read_csv(bronze_path)
+from etl.utils.io import read_bronze
 
-    # normaliza nomes de coluna
-    df.columns = [str(c).strip().lower() for c in df.columns]
+# mapeia apelidos comuns -> 'timestamp'
+ALIAS = {
+    "timestamp": "timestamp",
+    "datetime": "timestamp",
+    "datahora": "timestamp",
+    "time": "timestamp",
+    "ts": "timestamp",
+}
 
+# colunas mínimas (seleciona as que existirem)
+REQUIRED = ["timestamp", "site_code", "line_code", "equip_code", "kwh"]
+
+def time_column_rename(columns: list[str], cfg: dict) -> dict:
     # decide o nome da coluna de tempo a partir do config
     # (fallback para 'timestamp' se não houver no YAML)
     dt_col = (
@@ -15,32 +24,32 @@ def transform_energy(bronze_path: str, cfg: dict) -> pd.DataFrame:
            .get("datetime_col", "timestamp")
     ).lower()
 
-    # mapeia apelidos comuns -> 'timestamp'
-    alias = {
-        "timestamp": "timestamp",
-        "datetime": "timestamp",
-        "datahora": "timestamp",
-        "time": "timestamp",
-        "ts": "timestamp",
-    }
+    rename = {}
     # se houver a coluna esperada no config (ex.: 'timestamp' ou 'datetime'), usa
-    if dt_col in df.columns and "timestamp" not in df.columns:
-        df = df.rename(columns={dt_col: "timestamp"})
+    if dt_col in columns and "timestamp" not in columns:
+        rename = {dt_col: "timestamp"}
     else:
         # senão tenta os apelidos
-        for a, tgt in alias.items():
-            if a in df.columns and "timestamp" not in df.columns:
-                df = df.rename(columns={a: tgt})
+        for a, tgt in ALIAS.items():
+            if a in columns and "timestamp" not in columns:
+                rename = {a: tgt}
                 break
 
-    if "timestamp" not in df.columns:
+    if "timestamp" not in [rename.get(c, c) for c in columns]:
         # erro amigável com as colunas encontradas
-        cols = ", ".join(df.columns)
-        raise KeyError(f"Coluna de tempo não encontrada. Procurei por '{dt_col}' e aliases {list(alias.keys())}. Colunas disponíveis: {cols}")
+        cols = ", ".join(columns)
+        raise KeyError(f"Coluna de tempo não encontrada. Procurei por '{dt_col}' e aliases {list(ALIAS.keys())}. Colunas disponíveis: {cols}")
+    return rename
+
+def transform_energy(bronze_path: str | pa.Table, cfg: dict) -> pd.DataFrame:
+    # lê o parquet da Bronze (ou CSV, ou a tabela Arrow em memória)
+    df = read_bronze(bronze_path)
+
+    # normaliza nomes de coluna
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    df = df.rename(columns=time_column_rename(list(df.columns), cfg))
 
-    # colunas mínimas (seleciona as que existirem)
-    required = ["timestamp", "site_code", "line_code", "equip_code", "kwh"]
-    keep = [c for c in required if c in df.columns] + [c for c in df.columns if c not in required]
+    keep = [c for c in REQUIRED if c in df.columns] + [c for c in df.columns if c not in REQUIRED]
     df = df[keep].copy()
 
     # tipos e derivadas
@@ -50,4 +59,4 @@ def transform_energy(bronze_path: str, cfg: dict) -> pd.DataFrame:
     if "kwh" in df.columns:
         df["kwh"] = pd.to_numeric(df["kwh"], errors="coerce").fillna(0).clip(lower=0)
 
-    return df
\ No newline at end of file
+    return df
@@ -1,13 +1,16 @@
 import pandas as pd
+import pyarrow as pa
+
+from etl.utils.io import read_bronze
 
 REQUIRED = ["date","site_code","line_code","product_code","units_ok"]
 
-def transform_manuf(bronze_path: str, cfg: dict) -> pd.DataFrame:
-    df = pd.read_csv(bronze_path) if bronze_path.endswith(".csv") else pd.read_parquet(bronze_path)
+def transform_manuf(bronze_path: str | pa.Table, cfg: dict) -> pd.DataFrame:
+    df = read_bronze(bronze_path)
     req = [c for c in REQUIRED if c in df.columns]
     df = df[req + [c for c in df.columns if c not in req]].copy()
     df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df["dt"] = df["date"].dt.date.astype("datetime64[ns]")
+    df["dt"] = df["date"].dt.normalize()     # mesmo resultado de .dt.date, sem passar por objetos Python
     for col in ["units_ok","units_rework","scrap_units"]:
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
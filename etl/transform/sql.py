@@ -0,0 +1,69 @@
+# Versão DuckDB SQL de transform_energy / transform_manuf / transform_costs.
+# Cada função recebe a relação de origem (ex.: "read_parquet('...')") e as colunas
+# dela e devolve um SELECT com o mesmo resultado do caminho em pandas.
+from etl.transform.costs import REQUIRED as COSTS_REQUIRED
+from etl.transform.energy import REQUIRED as ENERGY_REQUIRED, time_column_rename
+from etl.transform.manufacturing import REQUIRED as MANUF_REQUIRED
+
+def quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _order(columns: list[str], required: list[str]) -> list[str]:
+    return [c for c in required if c in columns] + [c for c in columns if c not in required]
+
+# equivalentes de pd.to_datetime / pd.to_numeric com errors="coerce"
+def _ts(col: str) -> str:
+    return f"TRY_CAST({col} AS TIMESTAMP)"
+
+def _num(col: str) -> str:
+    return f"TRY_CAST({col} AS DOUBLE)"
+
+def _trunc(part: str, expr: str, dtype: str = "TIMESTAMP_NS") -> str:
+    # mesmo tipo que o pandas grava no Parquet: datetime64[ns] do .dt.floor/.normalize,
+    # datetime64[us] do .to_period().to_timestamp() (TIMESTAMP)
+    return f"CAST(date_trunc('{part}', {expr}) AS {dtype})"
+
+def _select(exprs: dict[str, str], src: str) -> str:
+    return "SELECT " + ", ".join(f"{e} AS {quote(n)}" for n, e in exprs.items()) + f" FROM {src}"
+
+def energy_sql(src: str, columns: list[str], cfg: dict) -> str:
+    # normaliza nomes de coluna e resolve a coluna de tempo como em transform_energy
+    norm = {str(c).strip().lower(): quote(c) for c in columns}
+    rename = time_column_rename(list(norm), cfg)
+    cols = {rename.get(n, n): c for n, c in norm.items()}
+
+    exprs = {n: cols[n] for n in _order(list(cols), ENERGY_REQUIRED)}
+    exprs["timestamp"] = f"CAST({_ts(cols['timestamp'])} AS TIMESTAMP_NS)"
+    if "kwh" in exprs:
+        exprs["kwh"] = f"GREATEST(COALESCE({_num(cols['kwh'])}, 0), 0)"
+    exprs["dt"] = _trunc("day", _ts(cols["timestamp"]))
+    return _select(exprs, src)
+
+def manuf_sql(src: str, columns: list[str], cfg: dict) -> str:
+    exprs = {n: quote(n) for n in _order(columns, MANUF_REQUIRED)}
+    exprs["date"] = f"CAST({_ts(quote('date'))} AS TIMESTAMP_NS)"
+    exprs["dt"] = _trunc("day", _ts(quote("date")))
+    for col in ["units_ok", "units_rework", "scrap_units"]:
+        if col in exprs:
+            # .fillna(0).astype(int) trunca em direção a zero
+            exprs[col] = f"CAST(trunc(COALESCE({_num(quote(col))}, 0)) AS BIGINT)"
+    if "oee" in exprs:
+        # GREATEST/LEAST ignoram NULL no DuckDB; o clip do pandas preserva NaN
+        oee = _num(quote("oee"))
+        exprs["oee"] = f"CASE WHEN {oee} IS NULL THEN NULL ELSE LEAST(GREATEST({oee}, 0), 1) END"
+    return _select(exprs, src)
+
+def costs_sql(src: str, columns: list[str], cfg: dict) -> str:
+    exprs = {n: quote(n) for n in _order(columns, COSTS_REQUIRED)}
+    exprs["ref_month"] = f"CAST({_ts(quote('ref_month'))} AS TIMESTAMP_NS)"
+    exprs["dt"] = _trunc("month", _ts(quote("ref_month")), "TIMESTAMP")
+    exprs["amount_br"] = f"COALESCE({_num(quote('amount_br'))}, 0.0)"
+    if "fx_rate" in exprs:
+        exprs["fx_rate"] = f"COALESCE({_num(quote('fx_rate'))}, 0.0)"
+    return _select(exprs, src)
+
+TRANSFORM_SQL = {
+    "energy": energy_sql,
+    "manufacturing": manuf_sql,
+    "costs": costs_sql,
+}
@@ -0,0 +1,52 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+
+CACHE_DIR = "_cas"
+FICLONE = 0x40049409        # ioctl de reflink (btrfs, xfs, bcachefs)
+
+# campos da fonte que alteram o conteúdo da parte Bronze gerada a partir do arquivo
+KEY_FIELDS = ["kind", "engine", "sheet", "columns", "categorical", "datetime_format"]
+PARSER_VERSION = 2      # sobe quando o parse muda a parte gerada (2: campo de texto vazio vira nulo)
+
+def cache_key(source_sha256: str, src: dict) -> str:
+    spec = json.dumps({"parser": PARSER_VERSION, **{k: src.get(k) for k in KEY_FIELDS}}, sort_keys=True, default=str)
+    return hashlib.sha256(f"{source_sha256}:{spec}".encode()).hexdigest()
+
+def link_or_copy(src_path: str, dst_path: str) -> str:
+    # hard link (sem cópia de bytes); cai para cópia se o filesystem não suportar
+    if os.path.exists(dst_path) and os.path.samefile(src_path, dst_path):
+        return dst_path
+    tmp = dst_path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src_path, tmp)
+    except OSError:
+        shutil.copyfile(src_path, tmp)
+    os.replace(tmp, dst_path)      # troca atômica: nunca sobrescreve o inode do objeto
+    return dst_path
+
+def reflink_or_copy(src_path: str, dst_path: str) -> str:
+    # reflink: cópia copy-on-write que compartilha os blocos; cai para cópia comum fora de btrfs/xfs
+    tmp = dst_path + ".tmp"
+    with open(src_path, "rb") as src, open(tmp, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            shutil.copyfileobj(src, dst, 16 << 20)
+    os.replace(tmp, dst_path)
+    return dst_path
+
+def prune_cache(cache_dir: str, keep: set[str]) -> list[str]:
+    # remove objetos de versões antigas dos arquivos de origem
+    if not os.path.isdir(cache_dir):
+        return []
+    removed = []
+    for f in os.listdir(cache_dir):
+        if f.split(".", 1)[0] not in keep:
+            os.remove(os.path.join(cache_dir, f))
+            removed.append(f)
+    return removed
@@ -0,0 +1,136 @@
+# Conexões DuckDB compartilhadas por ETL, validação e dashboards: uma conexão por arquivo
+# no processo, um cursor por thread, PRAGMAs da seção `duckdb` do config e fechamento no exit.
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import duckdb
+
+from etl.utils.io import load_yaml
+
+# config padrão do repo; o flow chama configure(cfg) com o config que recebeu
+DEFAULT_CONFIG = Path(__file__).resolve().parents[2] / "configs" / "config.yaml"
+PRAGMAS = ("threads", "memory_limit", "temp_directory")
+MEMORY = ":memory:"
+
+_lock = threading.RLock()
+_local = threading.local()
+_settings: dict | None = None
+_conns: dict[str, tuple[duckdb.DuckDBPyConnection, bool]] = {}
+_cursors: dict[str, list[duckdb.DuckDBPyConnection]] = {}
+_last_use: dict[str, float] = {}
+_readers: dict[str, int] = {}
+_write_locks: dict[str, threading.Lock] = {}
+_reaper: threading.Thread | None = None
+
+def configure(cfg: dict) -> None:
+    global _settings
+    _settings = dict((cfg or {}).get("duckdb") or {})
+
+def _get_settings() -> dict:
+    if _settings is None:
+        path = os.environ.get("ETL_CONFIG", str(DEFAULT_CONFIG))
+        configure(load_yaml(path) if os.path.exists(path) else {})
+    return _settings
+
+def _key(path: str) -> str:
+    return path if path == MEMORY else os.path.abspath(path)
+
+def _close(key: str) -> None:
+    for cur in _cursors.pop(key, []):
+        try:
+            cur.close()
+        except duckdb.Error:
+            pass
+    _last_use.pop(key, None)
+    con, _ = _conns.pop(key)
+    con.close()
+
+def _reap_idle(idle_s: float) -> None:
+    # fecha conexões somente-leitura ociosas: o lock no arquivo impede outro processo de escrever;
+    # com consulta de reading() em andamento a conexão fica, por mais longa que seja
+    with _lock:
+        now = time.monotonic()
+        for key in [k for k, (_, ro) in _conns.items()
+                    if ro and not _readers.get(k) and now - _last_use.get(k, now) > idle_s]:
+            _close(key)
+
+def _reap(idle_s: float) -> None:
+    while True:
+        time.sleep(max(idle_s / 2, 1))
+        _reap_idle(idle_s)
+
+def _start_reaper() -> None:
+    global _reaper
+    idle_s = _get_settings().get("idle_close_s")
+    if idle_s and _reaper is None:
+        _reaper = threading.Thread(target=_reap, args=(float(idle_s),), daemon=True, name="duckdb-reaper")
+        _reaper.start()
+
+def get_connection(path: str = MEMORY, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+    key = _key(path)
+    with _lock:
+        _last_use[key] = time.monotonic()
+        entry = _conns.get(key)
+        # leitura reaproveita a conexão de escrita; o DuckDB não aceita as duas no mesmo processo
+        if entry is not None and (read_only or not entry[1]):
+            return entry[0]
+        if entry is not None:
+            _close(key)
+        if path != MEMORY and not read_only:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+        con = duckdb.connect(path, read_only=read_only)
+        settings = _get_settings()
+        for name in PRAGMAS:
+            if settings.get(name) is not None:
+                con.execute(f"SET {name} = '{settings[name]}'")
+        _conns[key] = (con, read_only)
+        _start_reaper()
+        return con
+
+def cursor(path: str = MEMORY, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+    # cursor por thread sobre a conexão compartilhada: cada um tem sua própria transação
+    key = _key(path)
+    con = get_connection(path, read_only)
+    mine = _local.__dict__.setdefault("cursors", {})
+    if key not in mine or mine[key][0] is not con:
+        cur = con.cursor()
+        mine[key] = (con, cur)
+        with _lock:
+            _cursors.setdefault(key, []).append(cur)
+    return mine[key][1]
+
+@contextmanager
+def reading(path: str) -> Iterator[duckdb.DuckDBPyConnection]:
+    # cursor somente-leitura só durante a consulta: quando a última leitura em andamento termina,
+    # a conexão do arquivo é fechada e outro processo (o ETL) consegue o lock de escrita
+    key = _key(path)
+    with _lock:
+        _readers[key] = _readers.get(key, 0) + 1
+    try:
+        yield cursor(path, read_only=True)
+    finally:
+        with _lock:
+            _readers[key] -= 1
+            if not _readers[key]:
+                del _readers[key]
+                entry = _conns.get(key)
+                if path != MEMORY and entry is not None and entry[1]:
+                    _close(key)
+
+def write_lock(path: str) -> threading.Lock:
+    # um escritor por vez em cada banco: os domínios rodam em paralelo, mas DDL/upserts concorrentes conflitam
+    with _lock:
+        return _write_locks.setdefault(_key(path), threading.Lock())
+
+def close_all() -> None:
+    # libera os arquivos (e o lock de escrita) para outros processos
+    with _lock:
+        for key in list(_conns):
+            _close(key)
+
+atexit.register(close_all)
@@ -1,5 +1,13 @@
+import pandas as pd
+import pyarrow as pa
 import yaml
 
 def load_yaml(path: str):
     with open(path, "r") as f:
-        return yaml.safe_load(f)
\ No newline at end of file
+        return yaml.safe_load(f)
+
+def read_bronze(src: str | pa.Table) -> pd.DataFrame:
+    # parte da Bronze em disco (Parquet/CSV) ou já em memória (handoff.mode: memory)
+    if isinstance(src, pa.Table):
+        return src.to_pandas()
+    return pd.read_csv(src) if src.endswith(".csv") else pd.read_parquet(src)
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+
+from etl.utils.cache import cache_key
+
+MANIFEST = "_manifest.json"
+PENDING = "_manifest.pending.json"
+
+# extensões removidas do nome; o resto do nome (inclusive pontos) identifica a parte
+SUFFIXES = (".csv.gz", ".csv.zst", ".csv.bz2", ".csv", ".xlsx", ".parquet")
+
+def source_stem(path: str) -> str:
+    # energy_202504.csv -> energy_202504 (nome da parte gerada em cada camada)
+    name = os.path.basename(path)
+    for suffix in SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+def check_stems(files: list[str]) -> None:
+    # dois arquivos com o mesmo nome de parte (energy_202504.csv e .csv.gz) se sobrescreveriam
+    seen = {}
+    for f in files:
+        other = seen.setdefault(source_stem(f), f)
+        if other != f:
+            raise ValueError(f"Arquivos de origem com o mesmo nome de parte '{source_stem(f)}': {other}, {f}")
+
+def _sha256(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def fingerprint(path: str, prev: dict | None = None) -> dict:
+    st = os.stat(path)
+    fp = {"size": st.st_size, "mtime": st.st_mtime}
+    if prev and prev.get("size") == fp["size"] and prev.get("mtime") == fp["mtime"]:
+        fp["sha256"] = prev["sha256"]       # tamanho e mtime iguais: não relê o arquivo
+    else:
+        fp["sha256"] = _sha256(path)
+    return fp
+
+def _dump(obj: dict, path: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def load_manifest(manifest_dir: str, name: str = MANIFEST) -> dict:
+    path = os.path.join(manifest_dir, name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def layout_key(src: dict, options: dict) -> str:
+    # tudo da fonte que muda as partes geradas (partition_by, colunas, fuso...) e as opções do
+    # writer; `path` fica de fora: mudar o glob não muda o conteúdo de cada arquivo
+    spec = {k: v for k, v in src.items() if k != "path"}
+    return hashlib.sha256(json.dumps([spec, options], sort_keys=True, default=str).encode()).hexdigest()
+
+def plan_ingestion(files: list[str], manifest_dir: str, src: dict, layout: str) -> list[str]:
+    # grava o estado novo como pendente e devolve só os arquivos novos ou alterados (conteúdo,
+    # schema declarado ou layout); o manifesto só é promovido (commit_manifest) depois que a Gold termina
+    old = load_manifest(manifest_dir)
+    new = {}
+    for f in files:
+        fp = fingerprint(f, old.get(f))
+        new[f] = {**fp, "key": cache_key(fp["sha256"], src), "layout": layout}
+    os.makedirs(manifest_dir, exist_ok=True)
+    _dump(new, os.path.join(manifest_dir, PENDING))
+    return [f for f in files if any(old.get(f, {}).get(k) != new[f][k] for k in ("key", "layout"))]
+
+def commit_manifest(manifest_dir: str) -> None:
+    pending = os.path.join(manifest_dir, PENDING)
+    if os.path.exists(pending):
+        os.replace(pending, os.path.join(manifest_dir, MANIFEST))
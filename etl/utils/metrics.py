@@ -0,0 +1,133 @@
+# Métricas por estágio (tempo, CPU, linhas, bytes, pico de RSS) gravadas em ops.stage_metrics
+# no warehouse, uma linha por estágio/domínio, agrupadas pelo run_id do flow.
+import functools
+import inspect
+import logging
+import os
+import resource
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pyarrow.parquet as pq
+
+from etl.utils.duckdb_conn import cursor, write_lock
+
+TABLE = "ops.stage_metrics"
+DDL = f"""
+CREATE SCHEMA IF NOT EXISTS ops;
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    run_id VARCHAR, stage VARCHAR, domain VARCHAR, status VARCHAR, started_at TIMESTAMP,
+    wall_s DOUBLE, cpu_s DOUBLE, rows_in BIGINT, rows_out BIGINT,
+    bytes_read BIGINT, bytes_written BIGINT, peak_rss_mb DOUBLE
+);
+"""
+COUNTERS = ("rows_in", "rows_out", "bytes_read", "bytes_written")
+SAMPLE_S = 0.05         # intervalo da amostragem de RSS durante o estágio
+
+_run_id: str | None = None
+_local = threading.local()
+
+def start_run() -> str:
+    global _run_id
+    _run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    return _run_id
+
+def run_id() -> str:
+    return _run_id or start_run()
+
+def enabled(cfg: dict) -> bool:
+    return (cfg.get("metrics") or {}).get("enabled", False)
+
+def record(**counts) -> None:
+    # soma contadores na medição aberta mais interna desta thread (fora de uma: ignora)
+    stack = getattr(_local, "stack", None)
+    if stack:
+        for k, v in counts.items():
+            stack[-1][k] += int(v or 0)
+
+def file_bytes(paths) -> int:
+    return sum(os.path.getsize(p) for p in paths)
+
+def parquet_rows(paths) -> int:
+    # só o footer: não lê os dados
+    return sum(pq.ParquetFile(p).metadata.num_rows for p in paths)
+
+def _rss_mb() -> float | None:
+    # RSS atual do processo (Linux); sem /proc não há como medir só o intervalo
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+class PeakRss:
+    # pico de RSS dentro do intervalo, amostrado numa thread: ru_maxrss é o pico da vida do processo
+    # e zerar o VmHWM (/proc/self/clear_refs) atrapalharia os estágios que rodam em paralelo
+    def __init__(self, interval: float = SAMPLE_S):
+        self.interval = interval
+        self.peak = _rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True, name="rss-sampler")
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _rss_mb() or 0)
+
+    def __enter__(self) -> "PeakRss":
+        if self.peak is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self.peak is None:
+            # sem /proc: cai no pico do processo inteiro (ru_maxrss em KB no Linux)
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            return
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_mb() or 0)
+
+def save(cfg: dict, rec: dict) -> None:
+    path = cfg.get("duckdb_path", "warehouse.duckdb")
+    cols = list(rec)
+    with write_lock(path):
+        con = cursor(path)
+        con.execute(DDL)
+        con.execute(f"INSERT INTO {TABLE} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                    [rec[c] for c in cols])
+
+def measured(stage: str):
+    # mede a função (que recebe domain e cfg); ela informa linhas/bytes com record()
+    def wrap(fn):
+        sig = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            params = sig.bind(*args, **kwargs).arguments
+            cfg = params["cfg"]
+            if not enabled(cfg):
+                return fn(*args, **kwargs)
+            rec = {"run_id": run_id(), "stage": stage, "domain": params["domain"], "status": "error",
+                   "started_at": datetime.now(), **dict.fromkeys(COUNTERS, 0)}
+            stack = _local.__dict__.setdefault("stack", [])
+            stack.append(rec)
+            # CPU da thread do estágio: estágios concorrentes (outros domínios) não entram na conta,
+            # mas os pools que o estágio abre (gravação, threads do DuckDB) também não
+            t0, c0 = time.perf_counter(), time.thread_time()
+            rss = PeakRss()
+            try:
+                with rss:
+                    out = fn(*args, **kwargs)
+                rec["status"] = "ok"
+                return out
+            finally:
+                stack.pop()
+                rec.update(wall_s=time.perf_counter() - t0, cpu_s=time.thread_time() - c0, peak_rss_mb=rss.peak)
+                try:
+                    save(cfg, rec)
+                except Exception as e:      # métrica nunca derruba o estágio
+                    logging.getLogger("etl.flow").warning(f"{TABLE}: {e!r}")
+        return run
+    return wrap
@@ -0,0 +1,37 @@
+import pyarrow as pa
+import pytest
+
+from etl.extract.csv_loader import iter_csv_batches, load_csv_glob
+from etl.extract.schema import csv_convert_options
+from etl.quality.rules import run_rules
+
+SRC = {
+    "datetime_format": "%Y-%m-%d %H:%M:%S",
+    "columns": {"timestamp": "timestamp", "kwh": "float64"},
+    "categorical": ["site_code", "line_code", "equip_code"],
+}
+CFG = {"silver": "unused", "quality": {"required_cols": {"energy": ["site_code"]}}}
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "energy_202504.csv"
+    path.write_text("timestamp,site_code,line_code,equip_code,kwh\n"
+                    "2025-04-01 00:00:00,SC01,L1,E01,1.5\n"
+                    '2025-04-01 01:00:00,,L1,"",2.5\n')
+    return str(path)
+
+def _check(result: dict, rule: str, column: str) -> dict:
+    return next(c for c in result["checks"] if c["rule"] == rule and c["columns"] == [column])
+
+@pytest.mark.parametrize("typed", [True, False])
+def test_stream_empty_field_is_null(csv_path, typed):
+    convert = csv_convert_options(SRC) if typed else None
+    table = pa.Table.from_batches(list(iter_csv_batches(csv_path, convert=convert)))
+    assert table.column("site_code").to_pylist() == ["SC01", None]
+    assert table.column("equip_code").to_pylist() == ["E01", None]
+
+def test_frame_empty_categorical_fails_not_null(csv_path):
+    df = load_csv_glob(csv_path, convert=csv_convert_options(SRC))
+    assert df["site_code"].isna().tolist() == [False, True]
+    check = _check(run_rules("energy", df, CFG), "not_null", "site_code")
+    assert check["failed"] == 1 and not check["success"]
@@ -0,0 +1,28 @@
+import time
+
+import duckdb
+
+from etl.utils import duckdb_conn
+
+def _warehouse(tmp_path) -> str:
+    path = str(tmp_path / "wh.duckdb")
+    duckdb.connect(path).execute("CREATE TABLE t AS SELECT 1 AS a").close()
+    return path
+
+def test_reaper_skips_connection_in_use(tmp_path):
+    path = _warehouse(tmp_path)
+    key = duckdb_conn._key(path)
+    with duckdb_conn.reading(path) as con:
+        duckdb_conn._last_use[key] = time.monotonic() - 3600     # "ocioso" há uma hora
+        duckdb_conn._reap_idle(1)
+        assert key in duckdb_conn._conns
+        assert con.execute("SELECT a FROM t").fetchone() == (1,)
+    assert key not in duckdb_conn._conns       # última leitura terminou: arquivo liberado
+
+def test_reaper_closes_idle_read_only_cursor(tmp_path):
+    path = _warehouse(tmp_path)
+    key = duckdb_conn._key(path)
+    duckdb_conn.cursor(path, read_only=True).execute("SELECT a FROM t").fetchone()
+    duckdb_conn._last_use[key] = time.monotonic() - 3600
+    duckdb_conn._reap_idle(1)
+    assert key not in duckdb_conn._conns
@@ -0,0 +1,47 @@
+import logging
+from concurrent.futures import Future
+
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("prefect")
+
+from etl.flow import runner
+from etl.flow.handoff import Part
+from etl.flow.task_cache import cached, silver_cache_key
+
+CFG = {"task_cache": {"enabled": True}, "handoff": {"mode": "memory"}}
+
+@runner.task
+def count_rows(domain: str, parts: list, cfg: dict) -> int:
+    return sum(p.table.num_rows for p in parts)
+
+@runner.flow(name="memory-handoff-test")
+def memory_flow() -> int:
+    written = Future()
+    written.set_result([])
+    part = Part("energy_202504.parquet", pa.table({"kwh": [1.0, 2.0]}), written)
+    return cached(count_rows, CFG, silver_cache_key).submit("energy", [part], CFG).result()
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def test_memory_mode_has_no_cache_key_error():
+    # os loggers do Prefect não propagam para a raiz: configura o logging dele antes (o que
+    # trocaria os handlers) e põe o handler direto no "prefect"
+    from prefect.logging.configuration import setup_logging
+    setup_logging()
+    records = _Records()
+    logging.getLogger("prefect").addHandler(records)
+    runner.use_local(False)
+    try:
+        assert memory_flow() == 2
+    finally:
+        runner.use_local(False)
+        logging.getLogger("prefect").removeHandler(records)
+    assert not [m for m in records.messages if "computing cache key" in m]
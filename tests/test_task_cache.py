@@ -0,0 +1,52 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from etl.flow import runner
+from etl.flow.task_cache import cached, silver_cache_key
+
+calls = []
+
+@runner.task
+def stage_silver(domain: str, bronze_parts: list, cfg: dict) -> list[str]:
+    calls.append(domain)
+    out = os.path.join(cfg["silver"], domain, "energy_202504.parquet")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    pq.write_table(pa.table({"kwh": [float(len(calls))]}), out)
+    return [out]
+
+@runner.flow(name="task-cache-test")
+def silver_flow(cfg: dict) -> list[str]:
+    return cached(stage_silver, cfg, silver_cache_key).submit("energy", cfg["parts"], cfg).result()
+
+@pytest.fixture
+def cfg(tmp_path, monkeypatch):
+    monkeypatch.setattr(runner, "RESULTS_DIR", str(tmp_path / "results"))
+    runner.use_local(True)
+    calls.clear()
+    bronze = tmp_path / "bronze" / "energy" / "energy_202504.parquet"
+    bronze.parent.mkdir(parents=True)
+    pq.write_table(pa.table({"kwh": [1.0]}), bronze)
+    yield {"bronze": str(tmp_path / "bronze"), "silver": str(tmp_path / "silver"), "parts": [str(bronze)],
+           "sources": {"energy": {}}, "task_cache": {"enabled": True}}
+    runner.use_local(os.environ.get("ETL_RUNNER") == "local")
+
+def test_identical_run_is_a_hit(cfg):
+    first = silver_flow(cfg)
+    assert silver_flow(cfg) == first
+    assert calls == ["energy"]
+
+def test_rewritten_output_is_a_miss(cfg):
+    (out,) = silver_flow(cfg)
+    pq.write_table(pa.table({"kwh": [999.0]}), out)      # parte trocada depois do run
+    silver_flow(cfg)
+    assert calls == ["energy", "energy"]
+    assert pq.read_table(out).column("kwh").to_pylist() == [2.0]
+
+def test_missing_output_is_a_miss(cfg):
+    (out,) = silver_flow(cfg)
+    os.remove(out)
+    assert silver_flow(cfg) == [out]
+    assert calls == ["energy", "energy"]